@@ -0,0 +1,32 @@
+"""Shared machinery for the benchmarks."""
+
+import asyncio
+import contextlib
+
+
+class AsyncSuite:
+    """
+    A benchmark suite whose setup and benchmarks run on an event loop of
+    its own. Subclasses set up in ``asetup``, entering contexts that are
+    exited at teardown with ``enter``, and run coroutines with ``run``.
+    """
+
+    def setup(self, *params):
+        self.loop = asyncio.new_event_loop()
+        self.stack = contextlib.AsyncExitStack()
+        self.run(self.asetup(*params))
+
+    def teardown(self, *params):
+        self.run(self.stack.aclose())
+        self.loop.close()
+
+    async def asetup(self, *params):
+        pass
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    async def enter(self, context):
+        if hasattr(context, "__aenter__"):
+            return await self.stack.enter_async_context(context)
+        return self.stack.enter_context(context)
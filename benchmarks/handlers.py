@@ -0,0 +1,45 @@
+"""Benchmarks of the cluster REST API, served by an in-process Jupyter server."""
+
+import json
+
+from dask_labextension.tests.utils import fake_cluster_config, serve_jupyter
+
+from .common import AsyncSuite
+
+
+class ClusterHandler(AsyncSuite):
+    params = ([1, 100], [10, 1000])
+    param_names = ["clusters", "workers"]
+    timeout = 120
+
+    async def asetup(self, n_clusters, n_workers):
+        self.server = await self.enter(
+            serve_jupyter(fake_cluster_config(n_workers=n_workers))
+        )
+        manager = await self.server.manager
+        for _ in range(n_clusters):
+            model = await manager.start_cluster()
+        self.cluster_id = model["id"]
+        response = await self.server.fetch("dask/clusters")
+        self.etag = response.headers["Etag"]
+
+    def time_list_clusters(self, n_clusters, n_workers):
+        response = self.run(self.server.fetch("dask/clusters"))
+        json.loads(response.body)
+
+    def time_list_clusters_not_modified(self, n_clusters, n_workers):
+        self.run(
+            self.server.fetch("dask/clusters", headers={"If-None-Match": self.etag})
+        )
+
+    def time_get_cluster(self, n_clusters, n_workers):
+        response = self.run(self.server.fetch(f"dask/clusters/{self.cluster_id}"))
+        json.loads(response.body)
+
+    def time_scale_cluster(self, n_clusters, n_workers):
+        body = json.dumps({"workers": n_workers + 1, "adapt": None})
+        self.run(
+            self.server.fetch(
+                f"dask/clusters/{self.cluster_id}", method="PATCH", body=body
+            )
+        )
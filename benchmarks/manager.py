@@ -0,0 +1,62 @@
+"""Benchmarks of the cluster manager with many (fake) clusters and workers."""
+
+import dask
+
+from dask_labextension.manager import DaskClusterManager, make_cluster_model
+from dask_labextension.tests.utils import FakeCluster, fake_cluster_config
+
+from .common import AsyncSuite
+
+
+class MakeClusterModel:
+    params = [10, 100, 1000, 10000]
+    param_names = ["workers"]
+
+    def setup(self, n_workers):
+        self.cluster = FakeCluster(n_workers)
+
+    def time_make_cluster_model(self, n_workers):
+        make_cluster_model("id", "name", self.cluster, None)
+
+
+class Manager(AsyncSuite):
+    params = ([1, 10, 100], [10, 1000, 10000])
+    param_names = ["clusters", "workers"]
+    timeout = 120
+
+    async def asetup(self, n_clusters, n_workers):
+        if n_clusters * n_workers > 100000:
+            raise NotImplementedError("Too many workers")
+        await self.enter(dask.config.set(fake_cluster_config(n_workers=n_workers)))
+        self.manager = await self.enter(DaskClusterManager())
+        for _ in range(n_clusters):
+            model = await self.manager.start_cluster()
+        self.cluster_id = model["id"]
+
+    def time_list_clusters(self, n_clusters, n_workers):
+        self.run(self.manager.list_clusters(refresh=True))
+
+    def time_list_clusters_cached(self, n_clusters, n_workers):
+        self.run(self.manager.list_clusters())
+
+    def time_get_cluster(self, n_clusters, n_workers):
+        self.run(self.manager.get_cluster(self.cluster_id, refresh=True))
+
+    def time_scale_cluster(self, n_clusters, n_workers):
+        # Alternate between two sizes so that every call scales the cluster.
+        model = self.run(self.manager.get_cluster(self.cluster_id))
+        n = n_workers + 1 if model["workers"] == n_workers else n_workers
+        self.run(self.manager.scale_cluster(self.cluster_id, n))
+
+
+class StartCloseCluster(AsyncSuite):
+    async def asetup(self):
+        await self.enter(dask.config.set(fake_cluster_config(n_workers=10)))
+        self.manager = await self.enter(DaskClusterManager())
+
+    def time_start_close_cluster(self):
+        async def start_close():
+            model = await self.manager.start_cluster()
+            await self.manager.close_cluster(model["id"])
+
+        self.run(start_close())
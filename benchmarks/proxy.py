@@ -0,0 +1,89 @@
+"""
+Benchmarks of the dashboard proxy and dashboard checks,
+against a local stand-in for a Bokeh server.
+"""
+
+import itertools
+from urllib.parse import quote
+
+import dask
+from tornado.httpclient import HTTPRequest
+from tornado.websocket import websocket_connect
+
+from dask_labextension.tests.utils import (
+    fake_cluster_config,
+    serve_dashboard,
+    serve_jupyter,
+)
+
+from .common import AsyncSuite
+
+
+class DashboardProxy(AsyncSuite):
+    params = [0, 1, 6]
+    param_names = ["compression_level"]
+    timeout = 120
+
+    async def asetup(self, level):
+        self.dashboard = await self.enter(serve_dashboard())
+        config = dask.config.merge(
+            fake_cluster_config(dashboard_link=f"{self.dashboard}/status"),
+            {"labextension": {"compression": {"level": level}}},
+        )
+        self.server = await self.enter(serve_jupyter(config))
+        model = await (await self.server.manager).start_cluster()
+        self.path = f"dask/dashboard/{model['id']}"
+        self.versions = itertools.count()
+        self.gzip = {"Accept-Encoding": "gzip"}
+
+    def _fetch(self, path):
+        return self.run(
+            self.server.fetch(
+                f"{self.path}/{path}", headers=self.gzip, decompress_response=False
+            )
+        )
+
+    def time_static_asset(self, level):
+        self._fetch("statics/js/bokeh.min.js?v=cached")
+
+    def time_static_asset_uncached(self, level):
+        self._fetch(f"statics/js/bokeh.min.js?v={next(self.versions)}")
+
+    def time_document(self, level):
+        self._fetch("document.json")
+
+    def track_document_bytes_sent(self, level):
+        return len(self._fetch("document.json").body)
+
+    track_document_bytes_sent.unit = "bytes"
+
+    def time_websocket_patches(self, level):
+        async def receive():
+            url = self.server.url.replace("http", "ws", 1)
+            request = HTTPRequest(
+                f"{url}{self.path}/ws?messages=100&size=10000",
+                headers=self.server.headers,
+            )
+            connection = await websocket_connect(request, compression_options={})
+            while await connection.read_message() is not None:
+                pass
+
+        self.run(receive())
+
+
+class DashboardCheck(AsyncSuite):
+    params = [True, False]
+    param_names = ["cached"]
+
+    async def asetup(self, cached):
+        self.dashboard = await self.enter(serve_dashboard())
+        ttl = "1 hour" if cached else 0
+        config = dask.config.merge(
+            fake_cluster_config(),
+            {"labextension": {"dashboard-check": {"ttl": ttl}}},
+        )
+        self.server = await self.enter(serve_jupyter(config))
+        self.url = quote(self.dashboard, safe="")
+
+    def time_dashboard_check(self, cached):
+        self.run(self.server.fetch(f"dask/dashboard-check/{self.url}"))
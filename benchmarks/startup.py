@@ -0,0 +1,25 @@
+"""Benchmarks of the time the extension adds to the start of a Jupyter server."""
+
+LOAD = """
+from types import SimpleNamespace
+from tornado import web
+from dask_labextension import load_jupyter_server_extension
+
+app = SimpleNamespace(web_app=web.Application(base_url="/"))
+"""
+
+
+class Startup:
+    # Each of these runs in a fresh interpreter, so nothing is imported yet.
+    def timeraw_import(self):
+        return "import dask_labextension"
+
+    def timeraw_load_extension(self):
+        return LOAD + "load_jupyter_server_extension(app)"
+
+    def timeraw_first_request(self):
+        # The work that loading the extension defers to the first request.
+        return (
+            "dask_labextension.setup_settings(app.web_app.settings)",
+            LOAD + "import dask_labextension\nload_jupyter_server_extension(app)",
+        )
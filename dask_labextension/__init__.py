@@ -1,14 +1,33 @@
 """A Jupyter server extension for managing Dask clusters."""
 
+import importlib
+
 from jupyter_server.utils import url_path_join
+from tornado import web
+
+from ._version import __version__  # noqa
 
-from . import config  # noqa
-from .clusterhandler import DaskClusterHandler
-from .dashboardhandler import DaskDashboardCheckHandler, DaskDashboardHandler
-from .manager import DaskClusterManager
+# Importing dask, distributed and jupyter-server-proxy, and writing the
+# dask config file, slows down the start of the Jupyter server, so the
+# handlers only import them when the first request for a dask/ path arrives.
+# The public classes are imported from their modules when first accessed.
+_exports = {
+    "DashboardCheckCache": ".dashboardhandler",
+    "DaskClusterEventsHandler": ".clusterhandler",
+    "DaskClusterHandler": ".clusterhandler",
+    "DaskClusterManager": ".manager",
+    "DaskClusterTimeseriesHandler": ".clusterhandler",
+    "DaskDashboardCheckHandler": ".dashboardhandler",
+    "DaskDashboardHandler": ".dashboardhandler",
+    "DaskMetricsHandler": ".metricshandler",
+    "StaticAssetCache": ".dashboardhandler",
+}
 
 
-from ._version import __version__  # noqa
+def __getattr__(name):
+    if name in _exports:
+        return getattr(importlib.import_module(_exports[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def _jupyter_labextension_paths():
@@ -24,6 +43,34 @@ def _jupyter_server_extension_paths():
     return [{"module": "dask_labextension"}]
 
 
+def setup_settings(settings: dict) -> None:
+    """
+    Add the cluster manager, and the caches shared by the handlers,
+    to the settings of a web app, unless they are there already.
+    """
+    if "dask_cluster_manager" in settings:
+        return
+    from .dashboardhandler import DashboardCheckCache, StaticAssetCache
+    from .manager import DaskClusterManager
+
+    settings["dask_dashboard_check_cache"] = DashboardCheckCache()
+    settings["dask_static_cache"] = StaticAssetCache()
+    settings["dask_cluster_manager"] = DaskClusterManager()
+
+
+def _lazy_handler(name: str) -> type:
+    """
+    A stand-in for one of the extension's handler classes, which imports
+    the class, and sets up the extension, when it is first used.
+    """
+
+    def __new__(cls, application, request, **kwargs):
+        setup_settings(application.settings)
+        return __getattr__(name)(application, request, **kwargs)
+
+    return type(name, (web.RequestHandler,), {"__new__": __new__})
+
+
 def load_jupyter_server_extension(nb_server_app):
     """
     Called when the extension is loaded.
@@ -34,17 +81,28 @@ def load_jupyter_server_extension(nb_server_app):
     cluster_id_regex = r"(?P<cluster_id>[^/]+)"
     web_app = nb_server_app.web_app
     base_url = web_app.settings["base_url"]
-    web_app.settings["dask_cluster_manager"] = DaskClusterManager()
     get_cluster_path = url_path_join(base_url, "dask/clusters/" + cluster_id_regex)
     list_clusters_path = url_path_join(base_url, "dask/clusters/" + "?")
+    cluster_events_path = url_path_join(base_url, "dask/clusters/events")
+    timeseries_path = url_path_join(
+        base_url, f"dask/clusters/{cluster_id_regex}/timeseries"
+    )
     get_dashboard_path = url_path_join(
         base_url, f"dask/dashboard/{cluster_id_regex}(?P<proxied_path>.+)"
     )
     check_dashboard_path = url_path_join(base_url, "dask/dashboard-check/(?P<url>.+)")
+    check_dashboards_path = url_path_join(base_url, "dask/dashboard-check/?")
+    metrics_path = url_path_join(base_url, "dask/metrics")
+    cluster_handler = _lazy_handler("DaskClusterHandler")
+    dashboard_check_handler = _lazy_handler("DaskDashboardCheckHandler")
     handlers = [
-        (get_cluster_path, DaskClusterHandler),
-        (list_clusters_path, DaskClusterHandler),
-        (get_dashboard_path, DaskDashboardHandler),
-        (check_dashboard_path, DaskDashboardCheckHandler),
+        (cluster_events_path, _lazy_handler("DaskClusterEventsHandler")),
+        (timeseries_path, _lazy_handler("DaskClusterTimeseriesHandler")),
+        (get_cluster_path, cluster_handler),
+        (list_clusters_path, cluster_handler),
+        (get_dashboard_path, _lazy_handler("DaskDashboardHandler")),
+        (check_dashboard_path, dashboard_check_handler),
+        (check_dashboards_path, dashboard_check_handler),
+        (metrics_path, _lazy_handler("DaskMetricsHandler")),
     ]
     web_app.add_handlers(".*$", handlers)
@@ -7,9 +7,11 @@ import json
 from inspect import isawaitable
 
 from tornado import web
-from jupyter_server.base.handlers import APIHandler
+from tornado.websocket import WebSocketHandler
+from jupyter_server.base.handlers import APIHandler, JupyterHandler
+from jupyter_server.base.websocket import WebSocketMixin
 
-from .manager import DaskClusterManager
+from .manager import BudgetExceeded, ClusterEvent, DaskClusterManager
 
 
 class DaskClusterHandler(APIHandler):
@@ -32,38 +34,66 @@ class DaskClusterHandler(APIHandler):
         """
         try:  # to delete the cluster.
             val = await self.manager.close_cluster(cluster_id)
-            if val is None:
-                raise web.HTTPError(404, f"Dask cluster {cluster_id} not found")
-
-            else:
-                self.set_status(204)
-                self.finish()
         except Exception as e:
             raise web.HTTPError(500, str(e))
+        if val is None:
+            raise web.HTTPError(404, f"Dask cluster {cluster_id} not found")
+        self.set_status(204)
+        self.finish()
 
     @web.authenticated
     async def get(self, cluster_id: str = "") -> None:
         """
         Get a cluster by id. If no id is given, lists known clusters.
+        Models are served from a short-lived cache unless the
+        ``refresh=true`` query parameter is given.
+
+        Responses carry an ETag that changes only when the models do,
+        and a request with a matching If-None-Match gets a 304.
+
+        The list of clusters comes with a ``Dask-Headroom`` header: a JSON
+        object with the workers, threads and memory that may still be added
+        within ``labextension.budget`` (null for those that aren't limited).
         """
         manager = self.manager
+        refresh = self.get_query_argument("refresh", "false").lower() == "true"
         if cluster_id == "":
-            cluster_list = await manager.list_clusters()
-            self.set_status(200)
-            self.finish(json.dumps(cluster_list))
+            cluster_list = await manager.list_clusters(refresh=refresh)
+            self.set_header("Dask-Headroom", json.dumps(manager.headroom()))
+            # Don't let clients hold on to the models of unresponsive clusters.
+            if not any(model.get("stale") for model in cluster_list):
+                self._set_etag(manager.etag())
+            self._finish_json(cluster_list)
         else:
-            cluster_model = await manager.get_cluster(cluster_id)
+            cluster_model = await manager.get_cluster(cluster_id, refresh=refresh)
             if cluster_model is None:
                 raise web.HTTPError(404, f"Dask cluster {cluster_id} not found")
 
-            self.set_status(200)
-            self.finish(json.dumps(cluster_model))
+            self._set_etag(manager.etag(cluster_id))
+            self._finish_json(cluster_model)
+
+    def _set_etag(self, etag) -> None:
+        if etag is not None:
+            self.set_header("Etag", etag)
+
+    def _finish_json(self, model) -> None:
+        """
+        Finish with a model, or with a 304 (skipping serializing
+        the model) if the client already has the current version.
+        """
+        if "Etag" in self._headers and self.check_etag_header():
+            self.set_status(304)
+            self.finish()
+            return
+        self.set_status(200)
+        self.finish(json.dumps(model))
 
     @web.authenticated
     async def put(self, cluster_id: str = "") -> None:
         """
         Create a new cluster with a given id. If no id is given, a random
-        one is selected.
+        one is selected. The cluster is started in the background, and
+        the returned model has status "starting" until it is running.
         """
         if await self.manager.get_cluster(cluster_id):
             raise web.HTTPError(
@@ -71,7 +101,7 @@ class DaskClusterHandler(APIHandler):
             )
 
         try:
-            cluster_model = await self.manager.start_cluster(cluster_id)
+            cluster_model = await self.manager.create_cluster(cluster_id)
             self.set_status(200)
             self.finish(json.dumps(cluster_model))
         except Exception as e:
@@ -80,8 +110,11 @@ class DaskClusterHandler(APIHandler):
     @web.authenticated
     async def patch(self, cluster_id):
         """
-        Scale an existing cluster."
-        Not yet implemented.
+        Scale an existing cluster, either to a number of workers or adaptively.
+        If several requests for a cluster arrive while it is being scaled,
+        only the latest is applied and they all get the resulting model.
+        A request going over ``labextension.budget`` is clamped to fit,
+        or rejected with a 409 if the budget's policy is to reject.
         """
         new_model = json.loads(self.request.body)
         try:
@@ -95,7 +128,89 @@ class DaskClusterHandler(APIHandler):
                 cluster_model = await self.manager.scale_cluster(
                     cluster_id, new_model["workers"]
                 )
-            self.set_status(200)
-            self.finish(json.dumps(cluster_model))
+        except BudgetExceeded as e:
+            raise web.HTTPError(409, str(e))
         except Exception as e:
             raise web.HTTPError(500, str(e))
+        if cluster_model is None:
+            raise web.HTTPError(404, f"Dask cluster {cluster_id} not found")
+        self.set_status(200)
+        self.finish(json.dumps(cluster_model))
+
+
+class DaskClusterTimeseriesHandler(APIHandler):
+    """
+    A tornado HTTP handler for the recent load of a dask cluster.
+    """
+
+    manager: DaskClusterManager
+
+    async def prepare(self):
+        r = super().prepare()
+        if isawaitable(r):
+            await r
+        self.manager = await self.settings["dask_cluster_manager"]
+
+    @web.authenticated
+    async def get(self, cluster_id: str) -> None:
+        """
+        Get the samples of the load of a cluster, as columns of numbers
+        (with null for missing values). Passing the ``cursor`` of the
+        response as the ``since`` query parameter of the next request
+        gets only the samples taken in between.
+        """
+        try:
+            since = int(self.get_query_argument("since", "0"))
+        except ValueError:
+            raise web.HTTPError(400, "since must be an integer")
+        timeseries = self.manager.timeseries(cluster_id, since)
+        if timeseries is None:
+            raise web.HTTPError(404, f"Dask cluster {cluster_id} not found")
+        self.set_status(200)
+        self.finish(json.dumps(timeseries))
+
+
+class DaskClusterEventsHandler(WebSocketMixin, WebSocketHandler, JupyterHandler):
+    """
+    A tornado websocket handler that pushes changes to the known dask clusters.
+
+    On connection a ``snapshot`` event with every cluster model is sent,
+    followed by ``added``, ``updated`` and ``removed`` events as clusters change.
+    """
+
+    manager: DaskClusterManager
+
+    async def get(self, *args, **kwargs) -> None:
+        """
+        Authenticate the websocket upgrade request.
+        """
+        if not self.current_user:
+            raise web.HTTPError(403)
+        self.manager = await self.settings["dask_cluster_manager"]
+        return await super().get(*args, **kwargs)
+
+    def open(self, *args, **kwargs) -> None:
+        """
+        Subscribe to cluster events and send the initial snapshot.
+        """
+        super().open(*args, **kwargs)
+        snapshot = self.manager.subscribe(self._send_event)
+        self._send_event(snapshot)
+
+    def on_message(self, message) -> None:
+        """
+        Messages from the client are ignored.
+        """
+        pass
+
+    def on_close(self) -> None:
+        """
+        Unsubscribe from cluster events.
+        """
+        super().on_close()
+        self.manager.unsubscribe(self._send_event)
+
+    def _send_event(self, event: ClusterEvent) -> None:
+        if self.ws_connection is None or self.ws_connection.is_closing():
+            return
+        self.write_message(json.dumps(event))
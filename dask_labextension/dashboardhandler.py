@@ -3,18 +3,37 @@ A Dashboard handler for the Dask labextension.
 This proxies the bokeh server http and ws requests through the notebook
 server, preventing CORS issues.
 """
+import asyncio
+import hashlib
 import json
+import logging
+import time
+from collections import OrderedDict
 from inspect import isawaitable
+from typing import Awaitable, Callable, Dict, Tuple, Union
 from urllib import parse
 
-from tornado import httpclient, web
+import dask
+from dask.utils import parse_bytes, parse_timedelta
+from tornado import httpclient, httputil, web
+from tornado.simple_httpclient import SimpleAsyncHTTPClient
 
 
 from jupyter_server.base.handlers import APIHandler
 from jupyter_server.utils import url_path_join
 from jupyter_server_proxy.handlers import ProxyHandler
 
-from .manager import DaskClusterManager
+from .manager import DaskClusterManager, dashboard_route
+from .metrics import (
+    PROXY_SECONDS,
+    PROXY_WEBSOCKETS,
+    cache_counters,
+    record_proxy_bytes,
+    timed,
+)
+
+_record_check_cache = cache_counters("dashboard_check")
+_record_static_cache = cache_counters("static")
 
 
 class DaskDashboardCheckHandler(APIHandler):
@@ -31,97 +50,320 @@ class DaskDashboardCheckHandler(APIHandler):
         self.manager = await self.settings["dask_cluster_manager"]
 
     @web.authenticated
-    async def get(self, url) -> None:
+    async def get(self, url: str = "") -> None:
         """
         Test if a given url string hosts a dask dashboard. Should always return a
         200 code, any errors are presumed to result from an invalid/inactive dashboard.
+        A request without a url gets a 400.
+
+        Results are cached for ``labextension.dashboard-check.ttl`` (or
+        ``inactive-ttl`` for inactive dashboards), and concurrent checks of
+        the same URL share a single upstream fetch. Checks of the proxied
+        dashboard of a cluster that is still starting aren't cached, so that
+        it is found as soon as the cluster is running.
+        """
+        if not url:
+            raise web.HTTPError(400, "Expected a url to check")
+        result = await self._check(parse.unquote(url))
+        self.set_status(200)
+        self.finish(json.dumps(result))
+
+    @web.authenticated
+    async def post(self) -> None:
+        """
+        Test whether each of a list of url strings hosts a dask dashboard.
+
+        The request body is a JSON object with a ``urls`` list. The URLs are
+        checked concurrently, at most ``labextension.dashboard-check.concurrency``
+        at a time, and any that take longer than ``timeout`` are reported as
+        inactive. Returns a list of the same records as ``get``, in order.
+        """
+        try:
+            urls = json.loads(self.request.body)["urls"]
+            assert isinstance(urls, list)
+        except Exception:
+            raise web.HTTPError(400, "Expected a JSON object with a list of urls")
+
+        config = dask.config.get("labextension.dashboard-check")
+        semaphore = asyncio.Semaphore(config["concurrency"])
+        timeout = parse_timedelta(config["timeout"])
+
+        async def check(url):
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self._check(url), timeout)
+                except asyncio.TimeoutError:
+                    self.log.debug(f"Timed out checking for a dask dashboard at {url}")
+                    return {"url": url, "isActive": False, "plots": {}}
+
+        results = await asyncio.gather(*[check(url) for url in urls])
+        self.set_status(200)
+        self.finish(json.dumps(results))
+
+    async def _check(self, url: str) -> dict:
         """
+        Check a single url, going through the shared dashboard check cache.
+        """
+        # Extract query (if any) from URL, this will then be appended after path.
+        # This allows using (eg) "?token=[...]" in URL for authentication.
+        if "?" in url:
+            pos = url.find("?")
+            url, query = url[:pos], url[pos:]
+        else:
+            query = ""
+        url = _normalize_dashboard_link(url, self.request)
+
+        cache = self.settings["dask_dashboard_check_cache"]
+        return await cache.get(
+            f"{url}{query}",
+            lambda: _check_dashboard(
+                upstream_client(self.settings), url, query, self.request, self.log
+            ),
+            store=self._is_routed(url),
+        )
+
+    def _is_routed(self, url: str) -> bool:
+        """
+        Whether a (normalized) url is not the proxied dashboard of a cluster
+        whose dashboard route isn't known yet, as it is still starting.
+        """
+        prefix = url_path_join(self.base_url, "dask/dashboard/")
+        path = parse.urlparse(url).path
+        if not path.startswith(prefix):
+            return True
+        cluster_id = path[len(prefix) :].split("/")[0]
         try:
-            client = httpclient.AsyncHTTPClient()
+            self.manager.get_dashboard_route(cluster_id)
+        except KeyError:
+            return False
+        return True
+
 
-            # Extract query (if any) from URL, this will then be appended after path.
-            # This allows using (eg) "?token=[...]" in URL for authentication.
-            if "?" in url:
-                pos = url.find("?")
-                url, query = url[:pos], url[pos:]
+class DashboardCheckCache:
+    """
+    A cache of dashboard check results shared by all requests, which
+    coalesces concurrent checks of the same URL into one upstream fetch.
+    """
+
+    def __init__(self) -> None:
+        self._results: Dict[str, Tuple[float, dict]] = dict()
+        self._pending: Dict[str, asyncio.Future] = dict()
+
+    async def get(
+        self, key: str, check: Callable[[], Awaitable[dict]], store: bool = True
+    ) -> dict:
+        """
+        Get the check result for a key, running ``check`` if there is no
+        fresh result and no check for the key is already in flight. If
+        ``store`` is false, the result of the check isn't cached.
+        """
+        entry = self._results.get(key)
+        if entry and entry[0] > time.monotonic():
+            _record_check_cache(True)
+            return entry[1]
+
+        pending = self._pending.get(key)
+        _record_check_cache(pending is not None)
+        if pending is None:
+            pending = asyncio.ensure_future(check())
+            self._pending[key] = pending
+            if store:
+                pending.add_done_callback(lambda f: self._store(key, f))
             else:
-                query = ""
+                pending.add_done_callback(lambda f: self._pending.pop(key, None))
+        # Shield the shared check so that a client going away
+        # doesn't cancel it for everyone else.
+        return await asyncio.shield(pending)
+
+    def _store(self, key: str, future: asyncio.Future) -> None:
+        self._pending.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        now = time.monotonic()
+        # Drop expired entries so the cache doesn't grow without bound.
+        for k in [k for k, (expires, _) in self._results.items() if expires <= now]:
+            del self._results[k]
+        config = dask.config.get("labextension.dashboard-check")
+        ttl = parse_timedelta(config["ttl" if result["isActive"] else "inactive-ttl"])
+        if ttl > 0:
+            self._results[key] = (now + ttl, result)
+
+
+# A type for a cached static asset: its content type, body and ETag.
+StaticAsset = Tuple[str, bytes, str]
+
+# The paths under which dashboards serve their static assets: Bokeh's
+# resources, and those of distributed.
+STATIC_PREFIXES = ("/static/", "/statics/")
+
+
+class StaticAssetCache:
+    """
+    A bounded LRU cache of the static assets of dashboards (Bokeh's
+    JavaScript and CSS bundles), shared by all clusters, panes and users.
+    """
 
-            # First check for the individual-plots endpoint at user-provided url.
-            # We don't check for the root URL because that can trigger a lot of
-            # object creation in the bokeh document.
-            url = _normalize_dashboard_link(parse.unquote(url), self.request)
-            effective_url = None
-            individual_plots_url = url_path_join(
-                url,
-                f"individual-plots.json{query}",
-            )
-            try:
-                self.log.debug(
-                    f"Checking for individual plots at {individual_plots_url}"
-                )
-                individual_plots_response = await client.fetch(individual_plots_url)
-                self.log.debug(f"{individual_plots_response.code}")
-            except httpclient.HTTPError as err:
-                # If we didn't get individual plots, we may have to follow a redirect first.
-                self.log.debug(f"Checking for redirect at {url}")
-                response = await client.fetch(url)
-                effective_url = (
-                    _normalize_dashboard_link(response.effective_url, self.request)
-                    if response.effective_url != url
-                    else None
-                )
-                # If there was no redirect, raise.
-                if not effective_url:
-                    raise err
-
-                individual_plots_url = url_path_join(
-                    effective_url,
-                    "individual-plots.json",
-                )
-                self.log.debug(f"Found redirect at {effective_url}")
-                self.log.debug(
-                    f"Checking for individual plots at {individual_plots_url}"
-                )
-                individual_plots_response = await client.fetch(individual_plots_url)
-
-            # If we didn't get individual plots, it may not be a dask dashboard
-            if individual_plots_response.code != 200:
-                raise ValueError("Does not seem to host a dask dashboard")
-
-            individual_plots = json.loads(individual_plots_response.body)
-
-            # If there was query in original URL, append to URLs returned
-            if query:
-                for name, plot_url in individual_plots.items():
-                    individual_plots[name] = f"{plot_url}{query}"
-                url = f"{url}{query}"
-                if effective_url:
-                    effective_url = f"{effective_url}{query}"
-
-            self.set_status(200)
-            self.finish(
-                json.dumps(
-                    {
-                        "url": url,
-                        "isActive": True,
-                        "effectiveUrl": effective_url,
-                        "plots": individual_plots,
-                    }
-                )
+    def __init__(self) -> None:
+        self._assets: "OrderedDict[Tuple[str, str], StaticAsset]" = OrderedDict()
+        self.nbytes = 0
+
+    def get(self, key: Tuple[str, str]) -> Union[StaticAsset, None]:
+        """Get a cached asset, marking it as recently used."""
+        asset = self._assets.get(key)
+        if asset is not None:
+            self._assets.move_to_end(key)
+        return asset
+
+    def put(self, key: Tuple[str, str], asset: StaticAsset) -> None:
+        """
+        Cache an asset, evicting the least recently used ones to keep the
+        cache within ``labextension.static-cache.max-size``.
+        """
+        max_size = parse_bytes(dask.config.get("labextension.static-cache.max-size"))
+        if len(asset[1]) > max_size:
+            return
+        old = self._assets.pop(key, None)
+        if old is not None:
+            self.nbytes -= len(old[1])
+        self._assets[key] = asset
+        self.nbytes += len(asset[1])
+        while self.nbytes > max_size:
+            _, evicted = self._assets.popitem(last=False)
+            self.nbytes -= len(evicted[1])
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+
+def static_asset_key(
+    host: str, port: int, proxied_path: str, query: str
+) -> Union[Tuple[str, str], None]:
+    """
+    Get the cache key for a dashboard request, or None if it isn't for a
+    static asset. Assets are keyed by the version in their ``v`` query
+    argument, which Bokeh sets to a hash of their content, so that they
+    are shared between clusters. Unversioned assets are keyed by the
+    dashboard they come from.
+    """
+    if not proxied_path.startswith(STATIC_PREFIXES):
+        return None
+    version = parse.parse_qs(query).get("v")
+    if version:
+        return (f"v={version[0]}", proxied_path)
+    return (f"{host}:{port}", proxied_path)
+
+
+def _static_cache_control(key: Tuple[str, str]) -> str:
+    # Versioned assets never change, others must be revalidated with their ETag.
+    if key[0].startswith("v="):
+        return "private, max-age=31536000, immutable"
+    return "private, no-cache"
+
+
+@timed("dashboard_check")
+async def _check_dashboard(
+    client: httpclient.AsyncHTTPClient, url: str, query: str, request, log
+) -> dict:
+    """
+    Check whether a (normalized) url hosts a dask dashboard, returning a
+    ``{url, isActive, effectiveUrl, plots}`` record.
+    """
+    try:
+        # First check for the individual-plots endpoint at user-provided url.
+        # We don't check for the root URL because that can trigger a lot of
+        # object creation in the bokeh document.
+        effective_url = None
+        individual_plots_url = url_path_join(
+            url,
+            f"individual-plots.json{query}",
+        )
+        try:
+            log.debug(f"Checking for individual plots at {individual_plots_url}")
+            individual_plots_response = await client.fetch(individual_plots_url)
+            log.debug(f"{individual_plots_response.code}")
+        except httpclient.HTTPError as err:
+            # If we didn't get individual plots, we may have to follow a redirect first.
+            log.debug(f"Checking for redirect at {url}")
+            response = await client.fetch(url)
+            effective_url = (
+                _normalize_dashboard_link(response.effective_url, request)
+                if response.effective_url != url
+                else None
             )
-        except Exception:
-            self.log.debug(f"{url} does not seem to host a dask dashboard")
-            self.set_status(200)
-            self.finish(
-                json.dumps(
-                    {
-                        "url": url,
-                        "isActive": False,
-                        "plots": {},
-                    }
-                )
+            # If there was no redirect, raise.
+            if not effective_url:
+                raise err
+
+            individual_plots_url = url_path_join(
+                effective_url,
+                "individual-plots.json",
             )
+            log.debug(f"Found redirect at {effective_url}")
+            log.debug(f"Checking for individual plots at {individual_plots_url}")
+            individual_plots_response = await client.fetch(individual_plots_url)
+
+        # If we didn't get individual plots, it may not be a dask dashboard
+        if individual_plots_response.code != 200:
+            raise ValueError("Does not seem to host a dask dashboard")
+
+        individual_plots = json.loads(individual_plots_response.body)
+
+        # If there was query in original URL, append to URLs returned
+        if query:
+            for name, plot_url in individual_plots.items():
+                individual_plots[name] = f"{plot_url}{query}"
+            url = f"{url}{query}"
+            if effective_url:
+                effective_url = f"{effective_url}{query}"
+
+        return {
+            "url": url,
+            "isActive": True,
+            "effectiveUrl": effective_url,
+            "plots": individual_plots,
+        }
+    except Exception:
+        log.debug(f"{url} does not seem to host a dask dashboard")
+        return {
+            "url": url,
+            "isActive": False,
+            "plots": {},
+        }
+
+
+class CompressionTransform(web.GZipContentEncoding):
+    """
+    Gzips proxied responses at the level and minimum length configured by
+    ``labextension.compression``, counting the bytes before and after.
+    Responses that the dashboard already compressed are passed through.
+    """
+
+    def __init__(self, request: httputil.HTTPServerRequest) -> None:
+        super().__init__(request)
+        config = dask.config.get("labextension.compression")
+        self.GZIP_LEVEL = config["level"]
+        self.MIN_LENGTH = parse_bytes(config["min-length"])
+        self._gzipping = self._gzipping and self.GZIP_LEVEL > 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+
+    def transform_first_chunk(self, status_code, headers, chunk, finishing):
+        raw = len(chunk)
+        status_code, headers, chunk = super().transform_first_chunk(
+            status_code, headers, chunk, finishing
+        )
+        # A gzipped first chunk has been counted by transform_chunk.
+        if not self._gzipping:
+            self.raw_bytes += raw
+            self.sent_bytes += len(chunk)
+        return status_code, headers, chunk
+
+    def transform_chunk(self, chunk: bytes, finishing: bool) -> bytes:
+        self.raw_bytes += len(chunk)
+        chunk = super().transform_chunk(chunk, finishing)
+        self.sent_bytes += len(chunk)
+        return chunk
 
 
 class DaskDashboardHandler(ProxyHandler):
@@ -139,13 +381,117 @@ class DaskDashboardHandler(ProxyHandler):
     port is then used to call the proxy method on the base class.
     """
 
+    _compression: Union[CompressionTransform, None] = None
+    # The manager, once the cluster of the request is found, so that
+    # metrics are only recorded for clusters that exist.
+    _manager: Union[DaskClusterManager, None] = None
+
+    async def prepare(self, *args, **kwargs):
+        r = super().prepare(*args, **kwargs)
+        if isawaitable(r):
+            await r
+        self._compression = CompressionTransform(self.request)
+        self._transforms.append(self._compression)
+
+    def _metrics_cluster(self) -> Union[str, None]:
+        """
+        The id of the cluster to record metrics of the request under,
+        or None if the cluster wasn't found or has since been closed.
+        """
+        cluster_id = self.path_kwargs.get("cluster_id")
+        if self._manager is None:
+            return None
+        try:
+            self._manager.get_dashboard_route(cluster_id)
+        except KeyError:
+            return None
+        return cluster_id
+
+    def on_finish(self):
+        cluster_id = self._metrics_cluster()
+        if self._compression is not None and self._compression.raw_bytes:
+            raw, sent = self._compression.raw_bytes, self._compression.sent_bytes
+            if cluster_id is not None:
+                record_proxy_bytes(cluster_id, "http", raw, sent)
+            self.log.debug(f"Sent {self.request.path}: {sent} bytes of {raw}")
+        if cluster_id is None:
+            return
+        if self.request.headers.get("Upgrade", "").lower() != "websocket":
+            PROXY_SECONDS.labels(cluster_id).observe(self.request.request_time())
+
+    def get_compression_options(self):
+        """
+        Negotiate permessage-deflate for the browser-facing websocket,
+        at the configured compression level.
+        """
+        config = dask.config.get("labextension.compression")
+        if not config["websocket"] or config["level"] <= 0:
+            return None
+        return {"compression_level": config["level"]}
+
     async def http_get(self, cluster_id, proxied_path):
-        return await self.proxy(cluster_id, proxied_path)
+        host, port = await self._get_parsed(cluster_id)
+        key = static_asset_key(host, port, proxied_path, self.request.query)
+        if key is None:
+            return await super().proxy(host, port, proxied_path)
+
+        cache = self.settings["dask_static_cache"]
+        asset = cache.get(key)
+        _record_static_cache(asset is not None)
+        if asset is None:
+            # Cache the asset as it is proxied.
+            def store(response):
+                if response.code != 200:
+                    return
+                etag = f'"{hashlib.sha1(response.body).hexdigest()}"'
+                response.headers["Etag"] = etag
+                response.headers["Cache-Control"] = _static_cache_control(key)
+                content_type = response.headers.get("Content-Type", "")
+                cache.put(key, (content_type, response.body, etag))
+
+            # rewrite_response is an attribute of ProxyHandler that is set
+            # from its constructor's kwargs, rather than public API, and
+            # is applied to buffered responses from jupyter-server-proxy
+            # 4.4.0 (the minimum we require).
+            self.rewrite_response = (store,)
+            # Fetch the asset uncompressed, as we can't serve a compressed
+            # body to clients that don't accept it. The response to this
+            # client is compressed according to its own Accept-Encoding.
+            self.request.headers.pop("Accept-Encoding", None)
+            return await super().proxy(host, port, proxied_path)
+
+        content_type, body, etag = asset
+        if content_type:
+            self.set_header("Content-Type", content_type)
+        self.set_header("Etag", etag)
+        self.set_header("Cache-Control", _static_cache_control(key))
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+        self.write(body)
 
     async def open(self, cluster_id, proxied_path):
         host, port = await self._get_parsed(cluster_id)
+        # Keep the connection to count its bytes once it is closed.
+        self._ws_protocol = self.ws_connection
+        PROXY_WEBSOCKETS.labels(cluster_id).inc()
         return await super().proxy_open(host, port, proxied_path)
 
+    def on_close(self):
+        super().on_close()
+        protocol = getattr(self, "_ws_protocol", None)
+        if protocol is None:
+            return
+        cluster_id = self._metrics_cluster()
+        if cluster_id is not None:
+            PROXY_WEBSOCKETS.labels(cluster_id).dec()
+        raw = getattr(protocol, "_message_bytes_out", 0)
+        if raw:
+            sent = getattr(protocol, "_wire_bytes_out", raw)
+            if cluster_id is not None:
+                record_proxy_bytes(cluster_id, "websocket", raw, sent)
+            self.log.debug(f"Sent {self.request.path}: {sent} bytes of {raw}")
+
     # We have to duplicate all these for now, I've no idea why!
     # Figure out a way to not do that?
 
@@ -171,27 +517,72 @@ class DaskDashboardHandler(ProxyHandler):
         host, port = await self._get_parsed(cluster_id)
         return super().proxy(host, port, proxied_path)
 
+    async def _proxy_buffered(self, host, port, proxied_path, body, client):
+        # Use the shared upstream client rather than a new one per request.
+        # This overrides a private method of ProxyHandler, added in
+        # jupyter-server-proxy 4.4.0 (the minimum we require), so it may
+        # change without notice in later releases.
+        return await super()._proxy_buffered(
+            host, port, proxied_path, body, upstream_client(self.settings)
+        )
+
     async def _get_parsed(self, cluster_id):
         """
         Given a cluster ID, get the hostname and port of its bokeh server.
         """
-        # Get the cluster by ID. If it is not found,
-        # raise an error.
-        cluster_model = await self.manager.get_cluster(cluster_id)
-        if not cluster_model:
+        # Look up the route for the cluster, which the manager resolves
+        # once per cluster. If it is not found, raise an error.
+        manager = await self.settings["dask_cluster_manager"]
+        try:
+            route = manager.get_dashboard_route(cluster_id)
+        except KeyError:
             raise web.HTTPError(404, f"Dask cluster {cluster_id} not found")
 
-        # Construct the proper websocket proxy link from the cluster dashboard
-        dashboard_link = cluster_model["dashboard_link"]
-        dashboard_link = _normalize_dashboard_link(dashboard_link, self.request)
-        # Parse the url and return
-        parsed = parse.urlparse(dashboard_link)
-        port = parsed.port
-        if not port:
-            port = 443 if parsed.scheme == "https" else 80
-        if not parsed.hostname:
+        # A relative dashboard link is served from the same host as the application.
+        if route is None:
+            route = dashboard_route(f"{self.request.protocol}://{self.request.host}")
+        hostname, port = route
+        if not hostname:
             raise web.HTTPError(500, "Dask dashboard URI malformed")
-        return parsed.hostname, port
+        self._manager = manager
+        return hostname, port
+
+
+def make_upstream_client() -> httpclient.AsyncHTTPClient:
+    """
+    Make an HTTP client for requests to scheduler dashboards,
+    as configured by ``labextension.http-client``.
+    """
+    config = dask.config.get("labextension.http-client")
+    client_class = SimpleAsyncHTTPClient
+    if config["implementation"] == "curl":
+        try:
+            from tornado.curl_httpclient import CurlAsyncHTTPClient
+
+            client_class = CurlAsyncHTTPClient
+        except ImportError:
+            logging.getLogger(__name__).warning(
+                "pycurl is not installed, falling back to the simple HTTP client"
+            )
+    return client_class(
+        force_instance=True,
+        max_clients=config["max-clients"],
+        defaults=dict(
+            connect_timeout=parse_timedelta(config["connect-timeout"]),
+            request_timeout=parse_timedelta(config["request-timeout"]),
+        ),
+    )
+
+
+def upstream_client(settings: dict) -> httpclient.AsyncHTTPClient:
+    """
+    Get the HTTP client shared by the extension's handlers, creating
+    it on first use so that it is bound to the running event loop.
+    """
+    client = settings.get("dask_upstream_client")
+    if client is None:
+        client = settings["dask_upstream_client"] = make_upstream_client()
+    return client
 
 
 def _normalize_dashboard_link(link, request):
@@ -4,14 +4,45 @@
 # Distributed under the terms of the Modified BSD License.
 
 import asyncio
+import functools
 import importlib
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from inspect import isawaitable
-from typing import Any, Dict, List, Union
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Set,
+    Tuple,
+    Union,
+)
+from urllib.parse import urlparse
 from uuid import uuid4
 
 import dask
-from dask.utils import format_bytes
-from dask.distributed import Adaptive
+from dask.utils import format_bytes, format_time, parse_bytes, parse_timedelta
+from dask.distributed import Adaptive, LocalCluster
+from dask.system import cpu_count
+from distributed.system import memory_limit
+from tornado.ioloop import PeriodicCallback
+
+from . import config  # noqa: F401, registers the labextension defaults
+from .metrics import cache_counters, forget_proxy_metrics, timed
+from .sizing import Sizing, auto_sizing, estimate_workers, sizing_kwargs
+from .timeseries import COLUMNS, RingBuffer, to_json
+
+logger = logging.getLogger(__name__)
+
+# How often (in seconds) to check whether the warm pool of clusters
+# needs to be refilled or has sat idle for too long.
+POOL_CHECK_INTERVAL = 10
 
 # A type for a dask cluster model: a serializable
 # representation of information about the cluster.
@@ -20,31 +51,175 @@ ClusterModel = Dict[str, Any]
 # A type stub for a Dask cluster.
 Cluster = Any
 
+# A type for the host and port of a dashboard, or None if the dashboard
+# link is relative to the Jupyter server.
+DashboardRoute = Union[Tuple[Union[str, None], int], None]
+
+# A type for a cluster event: a serializable description
+# of a change to the clusters known to the manager.
+ClusterEvent = Dict[str, Any]
+
+_record_model_cache = cache_counters("model")
+
+# The fields of a cluster model describing the resources in use
+# by its workers, as found by `worker_usage`.
+USAGE = (
+    "memory_managed",
+    "memory_unmanaged",
+    "memory_spilled",
+    "tasks_processing",
+    "tasks_queued",
+    "cpu",
+)
+
+# The fields of a cluster model that change all the time, so changes
+# to them alone don't change the version of a model or get pushed to
+# subscribers.
+UNVERSIONED = USAGE + ("idle_time",)
+
+# The workers, threads and memory (in bytes) of the clusters owned by
+# a manager, or of its budget for them.
+RESOURCES = ("workers", "threads", "memory")
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised when starting or scaling a cluster would take the clusters of
+    a manager over ``labextension.budget``, and its policy is to reject.
+    """
 
-async def make_cluster(configuration: dict) -> Cluster:
+
+# The thread pool for blocking calls into synchronous clusters,
+# created on first use.
+_executor: Union[ThreadPoolExecutor, None] = None
+
+# Closing of clusters that finished starting after we stopped waiting for them.
+_discarding: Set[asyncio.Task] = set()
+
+
+def _versioned(model: ClusterModel) -> ClusterModel:
+    """The fields of a cluster model whose changes are versioned and pushed."""
+    return {key: value for key, value in model.items() if key not in UNVERSIONED}
+
+
+async def make_cluster(
+    configuration: dict,
+    admit: Union[Callable[[float, Tuple[int, int]], float], None] = None,
+) -> Tuple[Cluster, Union[Adaptive, None], Union[Sizing, None]]:
+    """
+    Start a cluster with the ``labextension.factory``, and scale it according
+    to ``configuration``.
+
+    If ``admit`` is given, it is called before the cluster is started with
+    the number of workers the cluster is to have, and the threads and memory
+    of each, and returns how many it may have (or raises). The cluster is
+    then started and scaled with no more than that.
+    """
     module = importlib.import_module(dask.config.get("labextension.factory.module"))
     Cluster = getattr(module, dask.config.get("labextension.factory.class"))
 
     kwargs = dask.config.get("labextension.factory.kwargs")
     kwargs = {key.replace("-", "_"): entry for key, entry in kwargs.items()}
+    kwargs, sizing = _size(kwargs)
 
-    cluster = await Cluster(
-        *dask.config.get("labextension.factory.args"), **kwargs, asynchronous=True
-    )
-
+    args = dask.config.get("labextension.factory.args")
     configuration = dask.config.merge(
         dask.config.get("labextension.default"), configuration
     )
+    if admit is not None:
+        local = isinstance(Cluster, type) and issubclass(Cluster, LocalCluster)
+        kwargs, configuration = _fit(kwargs, configuration, admit, local)
+
+    if dask.config.get("labextension.factory.asynchronous"):
+        with _blocking(f"Creating {Cluster.__name__}"):
+            cluster = Cluster(*args, **kwargs, asynchronous=True)
+        # Cancelling the start part way through (as the startup timeout does)
+        # would leave its scheduler and workers running, so let it finish.
+        cluster = await _wait_or_discard(asyncio.ensure_future(cluster))
+    else:
+        # A cluster that takes longer than the executor timeout to start
+        # is closed when it does, as nothing else would close it.
+        cluster = await _wait_or_discard(
+            _submit(Cluster, *args, **kwargs), _executor_timeout()
+        )
 
     adaptive = None
-    if configuration.get("adapt"):
-        adaptive = cluster.adapt(**configuration.get("adapt"))
+    try:
+        if configuration.get("adapt"):
+            adaptive = await _call(cluster, cluster.adapt, **configuration.get("adapt"))
+        elif configuration.get("workers") is not None:
+            await _call(cluster, cluster.scale, configuration.get("workers"))
+    except BaseException:
+        # Don't leak a cluster that we failed to configure.
+        await _close(cluster)
+        raise
+
+    return cluster, adaptive, sizing
+
+
+def _fit(
+    kwargs: Dict[str, Any],
+    configuration: dict,
+    admit: Callable[[float, Tuple[int, int]], float],
+    local: bool,
+) -> Tuple[Dict[str, Any], dict]:
+    """
+    Limit the workers that a cluster is started with, and then scaled
+    to, to the number that ``admit`` allows.
+    """
+    n, threads, memory = estimate_workers(kwargs, local=local)
+    adapt = configuration.get("adapt")
+    if adapt:
+        wanted = adapt.get("maximum", math.inf)
     elif configuration.get("workers") is not None:
-        t = cluster.scale(configuration.get("workers"))
-        if isawaitable(t):
-            await t
+        wanted = configuration["workers"]
+    else:
+        wanted = n
+    fit = admit(wanted, (threads, memory))
+    if fit < n:
+        # Fix the threads and memory of each worker, which LocalCluster
+        # would otherwise spread over the fewer workers.
+        kwargs = dict(kwargs, n_workers=int(fit))
+        if threads:
+            kwargs.setdefault("threads_per_worker", threads)
+        if memory:
+            kwargs.setdefault("memory_limit", memory)
+    if fit < wanted:
+        if adapt:
+            adapt = dict(adapt, minimum=min(adapt.get("minimum", 0), fit), maximum=fit)
+            configuration = dict(configuration, adapt=adapt)
+        else:
+            configuration = dict(configuration, workers=fit)
+    return kwargs, configuration
+
 
-    return cluster, adaptive
+def _size(kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], Union[Sizing, None]]:
+    """
+    Add the worker count, threads per worker and memory limit chosen by
+    ``labextension.sizing`` to the factory kwargs, unless they are set
+    explicitly, returning the kwargs and the resulting sizing.
+    """
+    config = dask.config.get("labextension.sizing")
+    if config["mode"] != "auto":
+        return kwargs, None
+    sizing = auto_sizing()
+    # Pinning a cluster whose workers run in the server's process would
+    # pin the server.
+    pin = config["pin"] and kwargs.get("processes", True)
+    auto = sizing_kwargs(sizing, pin=pin)
+    if "preload" in auto and kwargs.get("preload"):
+        preload = kwargs["preload"]
+        preload = [preload] if isinstance(preload, str) else list(preload)
+        auto["preload"] = preload + auto["preload"]
+    kwargs = dict(auto, **{k: v for k, v in kwargs.items() if k != "preload"})
+    sizing = dict(
+        sizing,
+        workers=kwargs["n_workers"],
+        threads_per_worker=kwargs["threads_per_worker"],
+        memory_limit=kwargs["memory_limit"],
+        pinned="preload" in auto,
+    )
+    return kwargs, sizing
 
 
 class DaskClusterManager:
@@ -60,16 +235,126 @@ class DaskClusterManager:
         self._cluster_names: Dict[str, str] = dict()
         self._n_clusters = 0
         self._initialized = None
+        # Cached cluster models and when they were last built. These are
+        # also the most recent models sent to event subscribers, used to
+        # compute the changes to push to them.
+        self._models: Dict[str, ClusterModel] = dict()
+        self._model_times: Dict[str, float] = dict()
+        self._subscribers: List[Callable[[ClusterEvent], None]] = []
+        self._watcher: Union[PeriodicCallback, None] = None
+        # The dashboard link of each cluster and the host/port it resolves to,
+        # so that proxied dashboard requests don't need to build a model.
+        self._routes: Dict[str, Tuple[str, DashboardRoute]] = dict()
+        self._startup_log: List[Dict[str, Any]] = []
+        # Pre-started clusters with the default configuration, with their
+        # sizing and the time they were added to the pool.
+        self._pool: List[
+            Tuple[Cluster, Union[Adaptive, None], Union[Sizing, None], float]
+        ] = []
+        # The sizing chosen for each cluster by labextension.sizing, if any.
+        self._sizings: Dict[str, Union[Sizing, None]] = dict()
+        # The number of workers each cluster was last scaled (or may adapt)
+        # to, and the threads and memory of each of its workers, used to
+        # keep the clusters within labextension.budget.
+        self._targets: Dict[str, float] = dict()
+        self._worker_shapes: Dict[str, Tuple[float, float]] = dict()
+        # Recent samples of the state of each cluster, for sparklines.
+        self._timeseries: Dict[str, RingBuffer] = dict()
+        self._sampler: Union[PeriodicCallback, None] = None
+        self._timeseries_polled = 0.0
+        self._pool_last_used = time.monotonic()
+        self._pool_filling: Union[asyncio.Task, None] = None
+        self._pool_cluster_memory: Union[int, None] = None
+        self._pool_watcher: Union[PeriodicCallback, None] = None
+        # Models for clusters that are starting in the background, or that
+        # failed to start, and the tasks starting them.
+        self._pending: Dict[str, ClusterModel] = dict()
+        self._tasks: Dict[str, asyncio.Task] = dict()
+        self._closing = set()
+        # Tasks rebuilding the models of synchronous clusters in the
+        # background for the periodic callbacks.
+        self._polling: Dict[str, asyncio.Task] = dict()
+        # Locks serializing the lifecycle operations on each cluster, and the
+        # scale or adapt operation (with a future for its result) waiting to
+        # run next on each cluster.
+        self._locks: Dict[str, asyncio.Lock] = dict()
+        self._queued: Dict[str, List[Any]] = dict()
+        # A counter bumped whenever a cluster model changes or is removed, and
+        # its value at the last change to each cluster, used to make entity
+        # tags. The prefix keeps them distinct across server restarts.
+        self._version = 0
+        self._versions: Dict[str, int] = dict()
+        self._etag_prefix = uuid4().hex[:8]
+        # When the reaper first found each cluster idle, how long it had been
+        # idle at the last check, and why the reaper last scaled it down or
+        # closed it.
+        self._idle_since: Dict[str, float] = dict()
+        self._idle_times: Dict[str, float] = dict()
+        self._reap_reasons: Dict[str, str] = dict()
+        self._reaper: Union[PeriodicCallback, None] = None
+        self._reaping: Union[asyncio.Task, None] = None
 
     async def _async_init(self):
         """The async part of init
 
         Invoked by `await manager`
         """
-        for model in dask.config.get("labextension.initial"):
-            await self.start_cluster(configuration=model)
+        config = dask.config.get("labextension.startup")
+        semaphore = asyncio.Semaphore(config["concurrency"])
+        timeout = parse_timedelta(config["timeout"])
+
+        async def start(configuration):
+            name = configuration.get("name", "")
+            async with semaphore:
+                start = time.monotonic()
+                try:
+                    model = await asyncio.wait_for(
+                        self.start_cluster(configuration=configuration), timeout
+                    )
+                    cluster_id, name, error = model["id"], model["name"], None
+                except Exception as e:
+                    cluster_id, error = None, repr(e)
+                duration = time.monotonic() - start
+            if error:
+                logger.warning(
+                    f"Failed to start initial Dask cluster {name!r} "
+                    f"after {duration:.2f}s: {error}"
+                )
+            else:
+                logger.info(f"Started initial Dask cluster {name!r} in {duration:.2f}s")
+            self._startup_log.append(
+                dict(id=cluster_id, name=name, duration=duration, error=error)
+            )
+
+        # Start the initial clusters concurrently, so that one slow or
+        # failing cluster doesn't hold up the others.
+        await asyncio.gather(
+            *[start(model) for model in dask.config.get("labextension.initial")]
+        )
+
+        if dask.config.get("labextension.warm-pool.size"):
+            self._pool_watcher = PeriodicCallback(
+                self._check_pool, POOL_CHECK_INTERVAL * 1000
+            )
+            self._pool_watcher.start()
+            self._check_pool()
+
+        config = dask.config.get("labextension.idle")
+        if config["scale-down-after"] is not None or config["close-after"] is not None:
+            interval = parse_timedelta(config["interval"])
+            self._reaper = PeriodicCallback(self._check_idle, interval * 1000)
+            self._reaper.start()
         return self
 
+    @property
+    def startup_log(self) -> List[Dict[str, Any]]:
+        """
+        How long each of the initial clusters took to start, as a list of
+        dicts with the cluster ``id``, ``name``, startup ``duration`` in
+        seconds, and the ``error`` raised if it failed (otherwise None).
+        """
+        return self._startup_log
+
     @property
     def initialized(self):
         """Don't create initialization task until it's been requested
@@ -82,6 +367,7 @@ class DaskClusterManager:
             self._initialized = asyncio.create_task(self._async_init())
         return self._initialized
 
+    @timed("start")
     async def start_cluster(
         self, cluster_id: str = "", configuration: dict = {}
     ) -> ClusterModel:
@@ -99,24 +385,154 @@ class DaskClusterManager:
         """
         if not cluster_id:
             cluster_id = str(uuid4())
+        self._name_cluster(cluster_id, configuration)
 
-        cluster, adaptive = await make_cluster(configuration)
-        self._n_clusters += 1
-
-        # Check for a name in the config
-        if not configuration.get("name"):
-            cluster_type = type(cluster).__name__
-            cluster_name = f"{cluster_type} {self._n_clusters}"
-        else:
-            cluster_name = configuration["name"]
+        try:
+            if not configuration:
+                # Hand out a pre-started cluster if there is one, and
+                # start another in the background to replace it.
+                self._pool_last_used = time.monotonic()
+                if self._pool:
+                    cluster, adaptive, sizing, _ = self._pool.pop(0)
+                else:
+                    cluster, adaptive, sizing = await self._make_cluster(
+                        cluster_id, configuration
+                    )
+                self._check_pool()
+            else:
+                cluster, adaptive, sizing = await self._make_cluster(
+                    cluster_id, configuration
+                )
+        except BaseException:
+            self._cluster_names.pop(cluster_id, None)
+            raise
 
         # Check if the cluster was started adaptively
         if adaptive:
             self._adaptives[cluster_id] = adaptive
 
         self._clusters[cluster_id] = cluster
-        self._cluster_names[cluster_id] = cluster_name
-        return make_cluster_model(cluster_id, cluster_name, cluster, adaptive=adaptive)
+        self._sizings[cluster_id] = sizing
+        if sizing is not None:
+            self._worker_shapes[cluster_id] = (
+                sizing["threads_per_worker"],
+                sizing["memory_limit"],
+            )
+        model = await self._refresh_model(cluster_id)
+
+        # Keep the new cluster within the budget of all the clusters, if it
+        # came from the warm pool or has more workers than were estimated.
+        adapt = model.get("adapt")
+        workers = adapt["maximum"] if adapt else model["workers"]
+        try:
+            fit = self._admit(cluster_id, workers)
+        except BudgetExceeded:
+            await self.close_cluster(cluster_id)
+            raise
+        self._targets[cluster_id] = fit
+        if fit >= workers:
+            return model
+        if adapt:
+            operation = functools.partial(
+                self._adapt_cluster, cluster_id, min(adapt["minimum"], fit), fit
+            )
+        else:
+            operation = functools.partial(self._scale_cluster, cluster_id, fit)
+        return await self._coalesce(cluster_id, operation)
+
+    def _name_cluster(self, cluster_id: str, configuration: dict) -> str:
+        """
+        Name a new cluster before it is started, from its configuration or
+        else its factory class and how many clusters have been started.
+        """
+        if cluster_id not in self._cluster_names:
+            self._n_clusters += 1
+            cluster_type = dask.config.get("labextension.factory.class")
+            self._cluster_names[cluster_id] = (
+                configuration.get("name") or f"{cluster_type} {self._n_clusters}"
+            )
+        return self._cluster_names[cluster_id]
+
+    async def _make_cluster(
+        self, cluster_id: str, configuration: dict
+    ) -> Tuple[Cluster, Union[Adaptive, None], Union[Sizing, None]]:
+        """
+        Start a cluster, with no more workers than fit within the budget.
+        Its workers are reserved in the budget while it is starting.
+        """
+        try:
+            return await make_cluster(
+                configuration, functools.partial(self._reserve, cluster_id)
+            )
+        except BaseException:
+            self._targets.pop(cluster_id, None)
+            self._worker_shapes.pop(cluster_id, None)
+            raise
+
+    def _reserve(self, cluster_id: str, n: float, shape: Tuple[int, int]) -> float:
+        """
+        Admit a cluster that is about to be started with ``n`` workers of
+        the given threads and memory, reserving the workers that fit.
+        """
+        if any(shape):
+            self._worker_shapes[cluster_id] = shape
+        fit = self._admit(cluster_id, n)
+        self._targets[cluster_id] = fit
+        return fit
+
+    async def create_cluster(
+        self, cluster_id: str = "", configuration: dict = {}
+    ) -> ClusterModel:
+        """
+        Start a new Dask cluster in the background.
+
+        Parameters
+        ----------
+        cluster_id : string
+            An optional string id for the cluster. If not given, a random id
+            will be chosen.
+
+        Returns
+        cluster_model : a placeholder model for the cluster with status
+            "starting". Once started, the cluster has status "running",
+            or "failed" (with an "error") if it could not be started.
+        """
+        if not cluster_id:
+            cluster_id = str(uuid4())
+
+        name = self._name_cluster(cluster_id, configuration)
+        model = make_pending_model(cluster_id, name, "starting")
+        self._pending[cluster_id] = model
+        self._publish(model)
+        self._tasks[cluster_id] = asyncio.ensure_future(
+            self._start_pending(cluster_id, configuration)
+        )
+        return model
+
+    async def _start_pending(self, cluster_id: str, configuration: dict) -> None:
+        """
+        Start a cluster created by `create_cluster`, recording any failure
+        in its model, and closing it if it was closed while starting.
+        """
+        try:
+            await self.start_cluster(cluster_id, configuration)
+        except Exception as e:
+            logger.warning(f"Failed to start Dask cluster {cluster_id}: {e!r}")
+            model = dict(self._pending.pop(cluster_id), status="failed", error=str(e))
+            if cluster_id in self._closing:
+                self._closing.discard(cluster_id)
+                self._publish_removal(cluster_id)
+            else:
+                self._pending[cluster_id] = model
+                self._publish(model)
+            return
+        finally:
+            self._tasks.pop(cluster_id, None)
+
+        self._pending.pop(cluster_id, None)
+        if cluster_id in self._closing:
+            self._closing.discard(cluster_id)
+            await self.close_cluster(cluster_id)
 
     async def close_cluster(self, cluster_id: str) -> Union[ClusterModel, None]:
         """
@@ -129,22 +545,71 @@ class DaskClusterManager:
 
         Returns
         cluster_model : the dask cluster model for the shut down cluster,
-            or None if it was not found.
+            or None if it was not found. A cluster that is still starting
+            is closed once it has started.
         """
+        pending = self._pending.get(cluster_id)
+        if pending and cluster_id not in self._clusters:
+            if pending["status"] == "failed":
+                self._pending.pop(cluster_id)
+                self._publish_removal(cluster_id)
+                return pending
+            self._closing.add(cluster_id)
+            model = self._pending[cluster_id] = dict(pending, status="closing")
+            self._publish(model)
+            return model
+
         cluster = self._clusters.get(cluster_id)
         if cluster:
-            r = cluster.close()
-            if isawaitable(r):
-                await r
-            self._clusters.pop(cluster_id)
-            name = self._cluster_names.pop(cluster_id)
-            adaptive = self._adaptives.pop(cluster_id, None)
-            return make_cluster_model(cluster_id, name, cluster, adaptive)
+            if cluster_id in self._closing:
+                return self._models[cluster_id]
+            self._closing.add(cluster_id)
+            model = self._models.get(cluster_id)
+            if model is not None:
+                self._publish(dict(model, status="closing"))
+            try:
+                async with self._lock(cluster_id):
+                    await _close(cluster)
+            finally:
+                self._closing.discard(cluster_id)
+            name = self._cluster_names[cluster_id]
+            adaptive = self._adaptives.get(cluster_id, None)
+            reap_reason = self._reap_reasons.get(cluster_id)
+            sizing = self._sizings.get(cluster_id)
+            self._forget(cluster_id)
+            return make_cluster_model(
+                cluster_id,
+                name,
+                cluster,
+                adaptive,
+                reap_reason=reap_reason,
+                sizing=sizing,
+            )
 
         else:
             return None
 
-    async def get_cluster(self, cluster_id) -> Union[ClusterModel, None]:
+    def _forget(self, cluster_id: str) -> None:
+        """Remove a closed cluster from the manager."""
+        self._clusters.pop(cluster_id, None)
+        self._cluster_names.pop(cluster_id, None)
+        self._adaptives.pop(cluster_id, None)
+        self._routes.pop(cluster_id, None)
+        self._closing.discard(cluster_id)
+        self._locks.pop(cluster_id, None)
+        self._idle_since.pop(cluster_id, None)
+        self._idle_times.pop(cluster_id, None)
+        self._reap_reasons.pop(cluster_id, None)
+        self._sizings.pop(cluster_id, None)
+        self._targets.pop(cluster_id, None)
+        self._worker_shapes.pop(cluster_id, None)
+        self._timeseries.pop(cluster_id, None)
+        forget_proxy_metrics(cluster_id)
+        self._publish_removal(cluster_id)
+
+    async def get_cluster(
+        self, cluster_id, refresh: bool = False
+    ) -> Union[ClusterModel, None]:
         """
         Get a Dask cluster model.
 
@@ -153,68 +618,179 @@ class DaskClusterManager:
         cluster_id : string
             A string id for the cluster.
 
+        refresh : bool
+            Whether to rebuild the model from the cluster even if the cached
+            model is still fresh.
+
         Returns
         cluster_model : the dask cluster model for the cluster,
             or None if it was not found.
         """
-        cluster = self._clusters.get(cluster_id)
-        name = self._cluster_names.get(cluster_id, "")
-        adaptive = self._adaptives.get(cluster_id)
-        if not cluster:
-            return None
+        if cluster_id not in self._clusters:
+            return self._pending.get(cluster_id)
 
-        return make_cluster_model(cluster_id, name, cluster, adaptive)
+        return await self._cached_model(cluster_id, refresh)
 
-    async def list_clusters(self) -> List[ClusterModel]:
+    async def list_clusters(self, refresh: bool = False) -> List[ClusterModel]:
         """
         List the Dask cluster models known to the manager.
 
+        Parameters
+        ----------
+        refresh : bool
+            Whether to rebuild the models from the clusters even if the cached
+            models are still fresh.
+
         Returns
         cluster_models : A list of the dask cluster models known to the manager.
+            The models of clusters that fail, or take longer than
+            ``labextension.model-cache.timeout``, to report their state are
+            the last known ones, marked as stale.
         """
-        return [
-            make_cluster_model(
-                cluster_id,
-                self._cluster_names[cluster_id],
-                self._clusters[cluster_id],
-                self._adaptives.get(cluster_id, None),
-            )
-            for cluster_id in self._clusters
+        models = await asyncio.gather(
+            *(self._list_model(cluster_id, refresh) for cluster_id in self._clusters)
+        )
+        return [model for model in models if model is not None] + [
+            model
+            for cluster_id, model in self._pending.items()
+            if cluster_id not in self._clusters
         ]
 
+    def etag(self, cluster_id: str = "") -> Union[str, None]:
+        """
+        Get an entity tag for the model of a cluster, or for the list of
+        clusters, which changes only when the model (or any model) changes.
+        As changes to the `UNVERSIONED` fields alone don't change it, it is a
+        weak validator: models with the same tag may differ in those.
+
+        Parameters
+        ----------
+        cluster_id : string
+            A string id for the cluster. If not given, the tag is for the
+            list of clusters.
+
+        Returns
+        etag : a weak entity tag, or None if the cluster is not known.
+        """
+        if not cluster_id:
+            return f'W/"{self._etag_prefix}-{self._version}"'
+        version = self._versions.get(cluster_id)
+        if version is None:
+            return None
+        return f'W/"{self._etag_prefix}-{cluster_id}-{version}"'
+
+    def get_dashboard_route(self, cluster_id: str) -> DashboardRoute:
+        """
+        Get the host and port of the dashboard for a cluster.
+
+        Parameters
+        ----------
+        cluster_id : string
+            A string id for the cluster.
+
+        Returns
+        route : a tuple of the dashboard hostname and port, or None if the
+            dashboard link is relative to the Jupyter server.
+
+        Raises
+        KeyError : if the cluster is not found.
+        """
+        return self._routes[cluster_id][1]
+
     async def scale_cluster(self, cluster_id: str, n: int) -> Union[ClusterModel, None]:
-        cluster = self._clusters.get(cluster_id)
-        name = self._cluster_names[cluster_id]
-        adaptive = self._adaptives.pop(cluster_id, None)
+        """
+        Scale a Dask cluster to a fixed number of workers,
+        stopping any adaptive scaling.
+
+        Operations on a cluster run one at a time. If several scale or adapt
+        requests for a cluster queue up behind a running operation, only the
+        latest is applied, and each of them returns the resulting model.
+
+        Parameters
+        ----------
+        cluster_id : string
+            A string id for the cluster.
+
+        n : int
+            The number of workers.
+
+        Returns
+        cluster_model : the dask cluster model for the cluster,
+            or None if it was not found.
+        """
+        # Being scaled by hand counts as activity for the idle reaper.
+        self._idle_since.pop(cluster_id, None)
+        return await self._coalesce(
+            cluster_id, functools.partial(self._scale_cluster, cluster_id, n)
+        )
+
+    async def adapt_cluster(
+        self, cluster_id: str, minimum: int, maximum: int
+    ) -> Union[ClusterModel, None]:
+        """
+        Scale a Dask cluster adaptively.
+
+        Like `scale_cluster`, only the latest of several queued scale
+        and adapt requests for a cluster is applied.
+
+        Parameters
+        ----------
+        cluster_id : string
+            A string id for the cluster.
 
+        minimum : int
+            The minimum number of workers.
+
+        maximum : int
+            The maximum number of workers.
+
+        Returns
+        cluster_model : the dask cluster model for the cluster,
+            or None if it was not found.
+        """
+        self._idle_since.pop(cluster_id, None)
+        return await self._coalesce(
+            cluster_id,
+            functools.partial(self._adapt_cluster, cluster_id, minimum, maximum),
+        )
+
+    @timed("scale")
+    async def _scale_cluster(
+        self, cluster_id: str, n: int
+    ) -> Union[ClusterModel, None]:
         # Check if the cluster exists
+        cluster = self._clusters.get(cluster_id)
         if not cluster:
             return None
 
         # Check if it is actually different.
-        model = make_cluster_model(cluster_id, name, cluster, adaptive)
+        model = await self._refresh_model(cluster_id)
+        n = self._admit(cluster_id, n)
+        self._targets[cluster_id] = n
         if model.get("adapt") is None and model["workers"] == n:
             return model
 
         # Otherwise, rescale the model.
-        t = cluster.scale(n)
-        if isawaitable(t):
-            await t
-        return make_cluster_model(cluster_id, name, cluster, adaptive=None)
+        adaptive = self._adaptives.pop(cluster_id, None)
+        if adaptive is not None:
+            adaptive.stop()
+        await _call(cluster, cluster.scale, n)
+        return await self._refresh_model(cluster_id)
 
-    async def adapt_cluster(
+    @timed("adapt")
+    async def _adapt_cluster(
         self, cluster_id: str, minimum: int, maximum: int
     ) -> Union[ClusterModel, None]:
-        cluster = self._clusters.get(cluster_id)
-        name = self._cluster_names[cluster_id]
-        adaptive = self._adaptives.pop(cluster_id, None)
-
         # Check if the cluster exists
+        cluster = self._clusters.get(cluster_id)
         if not cluster:
             return None
 
         # Check if it is actually different.
-        model = make_cluster_model(cluster_id, name, cluster, adaptive)
+        model = await self._refresh_model(cluster_id)
+        maximum = self._admit(cluster_id, maximum)
+        minimum = min(minimum, maximum)
+        self._targets[cluster_id] = maximum
         if (
             model.get("adapt") is not None
             and model["adapt"]["minimum"] == minimum
@@ -223,14 +799,662 @@ class DaskClusterManager:
             return model
 
         # Otherwise, rescale the model.
-        adaptive = cluster.adapt(minimum=minimum, maximum=maximum)
+        adaptive = await _call(cluster, cluster.adapt, minimum=minimum, maximum=maximum)
         self._adaptives[cluster_id] = adaptive
-        return make_cluster_model(cluster_id, name, cluster, adaptive)
+        return await self._refresh_model(cluster_id)
+
+    def headroom(self) -> Dict[str, Union[float, None]]:
+        """
+        The workers, threads and memory (in bytes) that may still be added to
+        the clusters of the manager within ``labextension.budget``, with None
+        for the resources that aren't limited.
+        """
+        return self._headroom()
+
+    def _headroom(self, exclude: str = "") -> Dict[str, Union[float, None]]:
+        """The headroom within the budget, leaving out one cluster."""
+        budget = _budget()
+        used = dict.fromkeys(RESOURCES, 0.0)
+        # Clusters that are starting have a target, but aren't registered yet.
+        for cluster_id in set(self._clusters) | set(self._targets):
+            if cluster_id == exclude:
+                continue
+            model = self._models.get(cluster_id)
+            n = max(model["workers"] if model else 0, self._targets.get(cluster_id, 0))
+            shape = self._worker_shapes.get(cluster_id, (0, 0))
+            for resource, per_worker in zip(RESOURCES, (1, *shape)):
+                # An adaptive cluster may have no maximum.
+                if per_worker:
+                    used[resource] += n * per_worker
+        for cluster, _, _, _ in self._pool:
+            workers = cluster.scheduler_info["workers"].values()
+            used["workers"] += len(workers)
+            used["threads"] += sum(d.get("nthreads", 0) for d in workers)
+            used["memory"] += sum(d["memory_limit"] or 0 for d in workers)
+        return {
+            resource: None
+            if budget[resource] is None
+            else max(0, budget[resource] - used[resource])
+            for resource in RESOURCES
+        }
+
+    def _admit(self, cluster_id: str, n: float) -> float:
+        """
+        The number of workers, at most ``n``, that a cluster may have within
+        ``labextension.budget``, given those of the other clusters.
+
+        Raises BudgetExceeded if fewer than ``n`` fit and the policy of
+        the budget is to reject rather than clamp such requests.
+        """
+        headroom = self._headroom(exclude=cluster_id)
+        threads, memory = self._worker_shapes.get(cluster_id, (0, 0))
+        fit = n
+        limits = []
+        for resource, per_worker in zip(RESOURCES, (1, threads, memory)):
+            available = headroom[resource]
+            if available is None or not per_worker:
+                continue
+            most = int(available // per_worker)
+            if most < fit:
+                fit = most
+                limits.append(resource)
+        if fit >= n:
+            return n
+
+        name = self._cluster_names.get(cluster_id, cluster_id)
+        available = ", ".join(
+            f"{format_bytes(headroom[r])} of memory"
+            if r == "memory"
+            else f"{int(headroom[r])} {r}"
+            for r in limits
+        )
+        message = (
+            f"Dask cluster {name!r} can't have {n} workers within the budget "
+            f"for all clusters: there is only room for {fit}, "
+            f"with {available} left"
+        )
+        if dask.config.get("labextension.budget.policy") == "reject":
+            raise BudgetExceeded(message)
+        logger.info(f"{message}. Using {fit} workers.")
+        return fit
+
+    def _lock(self, cluster_id: str) -> asyncio.Lock:
+        """The lock serializing lifecycle operations on a cluster."""
+        if cluster_id not in self._locks:
+            self._locks[cluster_id] = asyncio.Lock()
+        return self._locks[cluster_id]
+
+    async def _coalesce(
+        self,
+        cluster_id: str,
+        operation: Callable[[], Awaitable[Union[ClusterModel, None]]],
+    ) -> Union[ClusterModel, None]:
+        """
+        Run an operation on a cluster once the operations before it have
+        finished. While it waits, a newer operation replaces it, and the
+        result of whichever operation finally runs is returned to both.
+        """
+        if cluster_id not in self._clusters:
+            # Don't leave a lock behind for a cluster that doesn't exist.
+            return await operation()
+        queued = self._queued.get(cluster_id)
+        if queued is not None:
+            queued[0] = operation
+            return await asyncio.shield(queued[1])
+
+        entry = [operation, asyncio.get_running_loop().create_future()]
+        self._queued[cluster_id] = entry
+        try:
+            async with self._lock(cluster_id):
+                # Once we hold the lock, later operations queue up behind this one.
+                if self._queued.get(cluster_id) is entry:
+                    del self._queued[cluster_id]
+                try:
+                    entry[1].set_result(await entry[0]())
+                except Exception as e:
+                    entry[1].set_exception(e)
+        finally:
+            # Don't leave callers waiting on an operation that was cancelled.
+            if self._queued.get(cluster_id) is entry:
+                del self._queued[cluster_id]
+            if not entry[1].done():
+                entry[1].cancel()
+        return await entry[1]
+
+    def subscribe(self, callback: Callable[[ClusterEvent], None]) -> ClusterEvent:
+        """
+        Subscribe to changes in the clusters known to the manager.
+
+        Parameters
+        ----------
+        callback : callable
+            A function that is called with a cluster event whenever a cluster
+            is added (``{"type": "added", "cluster": model}``), changes
+            (``{"type": "updated", "cluster": model}``), or is removed
+            (``{"type": "removed", "id": cluster_id}``).
+
+        Returns
+        snapshot : a ``{"type": "snapshot", "clusters": [...]}`` event
+            with the current cluster models, from which the subscriber
+            can apply subsequent events.
+        """
+        self._subscribers.append(callback)
+        if self._watcher is None:
+            interval = parse_timedelta(dask.config.get("labextension.events.interval"))
+            self._watcher = PeriodicCallback(self._check_for_changes, interval * 1000)
+            self._watcher.start()
+        self._check_for_changes()
+        return {"type": "snapshot", "clusters": list(self._models.values())}
+
+    def unsubscribe(self, callback: Callable[[ClusterEvent], None]) -> None:
+        """
+        Stop sending cluster events to a subscriber.
+        """
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+        if not self._subscribers and self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _emit(self, event: ClusterEvent) -> None:
+        """Send an event to every subscriber."""
+        for callback in list(self._subscribers):
+            callback(event)
+
+    async def _cached_model(
+        self, cluster_id: str, refresh: bool = False
+    ) -> ClusterModel:
+        """
+        Get the cached model for a cluster, rebuilding it if it is older
+        than ``labextension.model-cache.ttl`` or if a refresh is requested.
+        """
+        if self._model_is_fresh(cluster_id, refresh):
+            return self._models[cluster_id]
+        return await self._refresh_model(cluster_id)
+
+    def _poll_model(self, cluster_id: str) -> Union[ClusterModel, None]:
+        """
+        Get the cached model for a cluster from a periodic callback,
+        rebuilding it if it is stale. The model of a synchronous cluster is
+        rebuilt in the thread pool in the background, so its last known
+        model (or None, if there is none) is returned meanwhile.
+        """
+        if self._model_is_fresh(cluster_id):
+            return self._models[cluster_id]
+        if _is_asynchronous(self._clusters[cluster_id]):
+            return self._update_model(self._build_model(cluster_id))
+        if cluster_id not in self._polling:
+            task = asyncio.ensure_future(self._list_model(cluster_id, True))
+            self._polling[cluster_id] = task
+            task.add_done_callback(lambda _: self._polling.pop(cluster_id, None))
+        return self._models.get(cluster_id)
+
+    async def _list_model(
+        self, cluster_id: str, refresh: bool
+    ) -> Union[ClusterModel, None]:
+        """
+        Get the model for a cluster, falling back to its last known model,
+        marked as stale, if building it fails or times out. The models of
+        synchronous clusters are built in the thread pool so that they
+        can be given up on. Returns None if the cluster is closed meanwhile.
+        """
+        cluster = self._clusters.get(cluster_id)
+        if cluster is None:
+            return None
+        try:
+            if _is_asynchronous(cluster):
+                return await self._cached_model(cluster_id, refresh)
+            timeout = parse_timedelta(
+                dask.config.get("labextension.model-cache.timeout")
+            )
+            model = await asyncio.wait_for(
+                self._cached_model(cluster_id, refresh), timeout
+            )
+        except Exception as e:
+            if self._clusters.get(cluster_id) is not cluster:
+                return None
+            logger.warning(f"Failed to get the model of cluster {cluster_id}: {e!r}")
+            return self._stale_model(cluster_id, e)
+        if self._clusters.get(cluster_id) is not cluster:
+            # The cluster was closed while we were waiting for it.
+            return None
+        return model
+
+    def _stale_model(self, cluster_id: str, error: Exception) -> ClusterModel:
+        """The last known model for a cluster, marked as stale."""
+        model = self._models.get(cluster_id) or make_pending_model(
+            cluster_id, self._cluster_names[cluster_id], "running"
+        )
+        if isinstance(error, asyncio.TimeoutError):
+            reason = "Timed out getting the state of the cluster"
+        else:
+            reason = str(error) or type(error).__name__
+        return dict(model, stale=True, error=reason)
+
+    def _model_is_fresh(self, cluster_id: str, refresh: bool = False) -> bool:
+        """Whether the cached model for a cluster can be reused."""
+        if refresh or cluster_id not in self._models:
+            fresh = False
+        else:
+            ttl = parse_timedelta(dask.config.get("labextension.model-cache.ttl"))
+            fresh = time.monotonic() - self._model_times[cluster_id] < ttl
+        _record_model_cache(fresh)
+        return fresh
+
+    def _make_model(self, cluster_id: str) -> ClusterModel:
+        """Build the model for a cluster, without caching or publishing it."""
+        return make_cluster_model(
+            cluster_id,
+            self._cluster_names[cluster_id],
+            self._clusters[cluster_id],
+            self._adaptives.get(cluster_id, None),
+            status="closing" if cluster_id in self._closing else "running",
+            idle_time=self._idle_times.get(cluster_id, 0),
+            reap_reason=self._reap_reasons.get(cluster_id),
+            sizing=self._sizings.get(cluster_id),
+        )
 
-    async def close(self):
-        """Close all clusters and cleanup"""
+    async def _refresh_model(self, cluster_id: str) -> ClusterModel:
+        """
+        Rebuild the model for a cluster, updating the cache and
+        notifying subscribers if it changed. The models of synchronous
+        clusters are built in the thread pool.
+        """
+        cluster = self._clusters[cluster_id]
+        if _is_asynchronous(cluster):
+            return self._update_model(self._build_model(cluster_id))
+        model = await run_in_executor(self._make_model, cluster_id)
+        if self._clusters.get(cluster_id) is not cluster:
+            # The cluster was closed while we were waiting for it.
+            return model
+        return self._update_model(model)
+
+    def _build_model(self, cluster_id: str) -> ClusterModel:
+        """Build the model for an asynchronous cluster on the event loop."""
+        with _blocking(f"Building the model of cluster {cluster_id}"):
+            return self._make_model(cluster_id)
+
+    def _update_model(self, model: ClusterModel) -> ClusterModel:
+        """
+        Cache a freshly built model for a cluster and
+        notify subscribers if it changed.
+        """
+        cluster_id = model["id"]
+        self._model_times[cluster_id] = time.monotonic()
+        if model["workers"]:
+            self._worker_shapes[cluster_id] = (
+                model["cores"] / model["workers"],
+                model["memory_limit"] / model["workers"],
+            )
+        link = model["dashboard_link"]
+        if cluster_id not in self._routes or self._routes[cluster_id][0] != link:
+            self._routes[cluster_id] = (link, dashboard_route(link))
+        self._publish(model)
+        return self._models[cluster_id]
+
+    def _publish(self, model: ClusterModel) -> None:
+        """Record a cluster model, notifying subscribers if it changed."""
+        old = self._models.get(model["id"])
+        if old == model:
+            return
+        self._models[model["id"]] = model
+        if old is not None and _versioned(old) == _versioned(model):
+            return
+        self._version += 1
+        self._versions[model["id"]] = self._version
+        self._emit({"type": "updated" if old else "added", "cluster": model})
+
+    def _publish_removal(self, cluster_id: str) -> None:
+        """Forget a cluster model, notifying subscribers that it is gone."""
+        self._model_times.pop(cluster_id, None)
+        if self._models.pop(cluster_id, None) is not None:
+            self._version += 1
+            self._versions.pop(cluster_id, None)
+            self._emit({"type": "removed", "id": cluster_id})
+
+    def _check_for_changes(self) -> None:
+        """
+        Compare the current cluster models with those last sent to
+        subscribers, and publish any differences. Changes that happen
+        outside of the manager (e.g. workers joining or adaptive scaling)
+        are picked up here.
+        """
+        for cluster_id in list(self._models):
+            if cluster_id not in self._clusters and cluster_id not in self._pending:
+                self._publish_removal(cluster_id)
         for cluster_id in list(self._clusters):
-            await self.close_cluster(cluster_id)
+            try:
+                self._poll_model(cluster_id)
+            except Exception:
+                continue
+
+    def _sample(self) -> None:
+        """
+        Add the current workers, cores, memory in use, task counts and CPU
+        use of each cluster to its time series, or stop sampling if no one
+        has asked for them for ``labextension.timeseries.idle-after``.
+        """
+        config = dask.config.get("labextension.timeseries")
+        idle_after = parse_timedelta(config["idle-after"])
+        if time.monotonic() - self._timeseries_polled > idle_after:
+            if self._sampler is not None:
+                self._sampler.stop()
+                self._sampler = None
+            return
+        length = config["length"]
+        now = time.time()
+        for cluster_id in list(self._clusters):
+            if cluster_id in self._closing:
+                continue
+            try:
+                model = self._poll_model(cluster_id)
+            except Exception:
+                continue
+            if model is None:
+                continue
+            buffer = self._timeseries.get(cluster_id)
+            if buffer is None:
+                buffer = self._timeseries[cluster_id] = RingBuffer(COLUMNS, length)
+            memory = None
+            if model["memory_managed"] is not None:
+                memory = model["memory_managed"] + model["memory_unmanaged"]
+            buffer.append(dict(model, time=now, memory=memory))
+
+    def timeseries(self, cluster_id: str, since: int = 0) -> Union[Dict, None]:
+        """
+        Get recent samples of the state of a cluster, taken every
+        ``labextension.timeseries.interval``. Clusters are only sampled
+        while their time series are being asked for, so the first call
+        starts sampling them.
+
+        Parameters
+        ----------
+        cluster_id : string
+            A string id for the cluster.
+
+        since : int
+            The cursor returned by the last call, to get only the samples
+            taken since then. By default, all the samples kept are returned.
+
+        Returns
+        timeseries : a dict with the ``cursor`` for the next call, and the
+            ``columns`` of samples (time, workers, cores, memory, task counts
+            and CPU use) as lists with None for missing values, or None if
+            the cluster was not found.
+        """
+        if cluster_id not in self._clusters:
+            return None
+        self._timeseries_polled = time.monotonic()
+        interval = dask.config.get("labextension.timeseries.interval")
+        if self._sampler is None and interval is not None:
+            interval = parse_timedelta(interval)
+            self._sampler = PeriodicCallback(self._sample, interval * 1000)
+            self._sampler.start()
+            self._sample()
+        buffer = self._timeseries.get(cluster_id)
+        if buffer is None:
+            return {"cursor": 0, "columns": {column: [] for column in COLUMNS}}
+        cursor, columns = buffer.since(since)
+        return {"cursor": cursor, "columns": to_json(columns)}
+
+    @property
+    def models(self) -> List[ClusterModel]:
+        """
+        The most recently built models of the clusters known to the
+        manager, including those starting or failed, without rebuilding them.
+        """
+        return list(self._models.values())
+
+    @property
+    def pool_size(self) -> int:
+        """
+        The number of pre-started clusters ready to be handed out.
+        """
+        return len(self._pool)
+
+    def _check_pool(self) -> None:
+        """
+        Close pooled clusters that have sat unused for longer than
+        ``labextension.warm-pool.max-idle``, and otherwise start
+        refilling the pool if it is below its configured size.
+        """
+        config = dask.config.get("labextension.warm-pool")
+        max_idle = parse_timedelta(config["max-idle"])
+        now = time.monotonic()
+        for entry in list(self._pool):
+            if now - entry[3] > max_idle:
+                self._pool.remove(entry)
+                asyncio.ensure_future(_close(entry[0]))
+
+        # Only refill the pool while it is being used.
+        idle = now - self._pool_last_used > max_idle
+        if (
+            not idle
+            and len(self._pool) < (config["size"] or 0)
+            and self._pool_filling is None
+        ):
+            self._pool_filling = asyncio.ensure_future(self._fill_pool())
+
+    async def _fill_pool(self) -> None:
+        """
+        Start clusters with the default configuration until the pool is full,
+        or until it would hold more than ``labextension.warm-pool.memory-limit``.
+        """
+        try:
+            while True:
+                config = dask.config.get("labextension.warm-pool")
+                if len(self._pool) >= (config["size"] or 0):
+                    break
+                limit = config["memory-limit"]
+                limit = parse_bytes(limit) if limit is not None else None
+                memory = sum(_cluster_memory(entry[0]) for entry in self._pool)
+                # Don't start a cluster that we expect to go over the limit.
+                if limit is not None and self._pool_cluster_memory is not None:
+                    if memory + self._pool_cluster_memory > limit:
+                        break
+                cluster, adaptive, sizing = await make_cluster({})
+                self._pool_cluster_memory = _cluster_memory(cluster)
+                if limit is not None and memory + self._pool_cluster_memory > limit:
+                    await _close(cluster)
+                    break
+                # Nor one that would go over the budget for all clusters.
+                headroom = self._headroom()
+                workers = cluster.scheduler_info["workers"].values()
+                needed = dict(
+                    workers=len(workers),
+                    threads=sum(d.get("nthreads", 0) for d in workers),
+                    memory=self._pool_cluster_memory,
+                )
+                if any(
+                    headroom[r] is not None and needed[r] > headroom[r]
+                    for r in RESOURCES
+                ):
+                    await _close(cluster)
+                    break
+                self._pool.append((cluster, adaptive, sizing, time.monotonic()))
+        except Exception as e:
+            logger.warning(f"Failed to start a Dask cluster for the warm pool: {e!r}")
+        finally:
+            self._pool_filling = None
+
+    def _check_idle(self) -> None:
+        """Start reaping idle clusters, unless the last check is still running."""
+        if self._reaping is None:
+            self._reaping = asyncio.ensure_future(self._reap())
+
+    async def _reap(self) -> None:
+        """
+        Scale down clusters that have been idle for longer than
+        ``labextension.idle.scale-down-after`` to ``labextension.idle.minimum``
+        workers, and close those idle for longer than ``close-after``.
+        A cluster is idle while no tasks are processing or queued on it, and
+        no clients are connected to it. Clusters whose activity can't be
+        told, as their scheduler isn't in this process, are left alone.
+        """
+        try:
+            config = dask.config.get("labextension.idle")
+            scale_down_after = config["scale-down-after"]
+            if scale_down_after is not None:
+                scale_down_after = parse_timedelta(scale_down_after)
+            close_after = config["close-after"]
+            if close_after is not None:
+                close_after = parse_timedelta(close_after)
+            minimum = config["minimum"] or 0
+
+            now = time.monotonic()
+            for cluster_id, cluster in list(self._clusters.items()):
+                if cluster_id in self._closing:
+                    continue
+                try:
+                    activity = cluster_activity(cluster)
+                except Exception as e:
+                    logger.debug(
+                        f"Failed to check cluster {cluster_id} for activity: {e!r}"
+                    )
+                    continue
+                if activity is None:
+                    continue
+                if any(activity):
+                    self._idle_since.pop(cluster_id, None)
+                    idle = 0
+                else:
+                    idle = round(now - self._idle_since.setdefault(cluster_id, now))
+                if self._idle_times.get(cluster_id, 0) != idle:
+                    self._idle_times[cluster_id] = idle
+                    model = self._models.get(cluster_id)
+                    if model is not None:
+                        self._publish(dict(model, idle_time=idle))
+
+                try:
+                    if close_after is not None and idle > close_after:
+                        reason = f"Closed after {format_time(idle)} idle"
+                        logger.info(f"{reason}: Dask cluster {cluster_id}")
+                        self._reap_reasons[cluster_id] = reason
+                        await self.close_cluster(cluster_id)
+                    elif scale_down_after is None or idle <= scale_down_after:
+                        pass
+                    elif cluster_id in self._adaptives:
+                        # Keep adaptive clusters adaptive, so that they scale
+                        # back up when they are used again.
+                        adaptive = self._adaptives[cluster_id]
+                        if adaptive.minimum <= minimum:
+                            continue
+                        reason = (
+                            f"Adaptive minimum lowered to {minimum} workers "
+                            f"after {format_time(idle)} idle"
+                        )
+                        logger.info(f"{reason}: Dask cluster {cluster_id}")
+                        self._reap_reasons[cluster_id] = reason
+                        await self._coalesce(
+                            cluster_id,
+                            functools.partial(
+                                self._adapt_cluster,
+                                cluster_id,
+                                minimum,
+                                adaptive.maximum,
+                            ),
+                        )
+                    elif len(cluster.scheduler_info["workers"]) > minimum:
+                        reason = (
+                            f"Scaled down to {minimum} workers "
+                            f"after {format_time(idle)} idle"
+                        )
+                        logger.info(f"{reason}: Dask cluster {cluster_id}")
+                        self._reap_reasons[cluster_id] = reason
+                        await self._coalesce(
+                            cluster_id,
+                            functools.partial(self._scale_cluster, cluster_id, minimum),
+                        )
+                except Exception as e:
+                    logger.warning(
+                        f"Failed to reap idle Dask cluster {cluster_id}: {e!r}"
+                    )
+        finally:
+            self._reaping = None
+
+    async def close(self) -> Dict[str, str]:
+        """
+        Close all clusters and cleanup.
+
+        Clusters are closed concurrently, at most ``labextension.shutdown.concurrency``
+        at a time. A cluster that fails to close, or takes longer than
+        ``labextension.shutdown.timeout``, is forcibly closed by killing its
+        workers and scheduler.
+
+        Returns
+        failures : a mapping from the id of each cluster that did not close
+            cleanly to the reason why.
+        """
+        if self._pool_watcher is not None:
+            self._pool_watcher.stop()
+            self._pool_watcher = None
+        if self._pool_filling is not None:
+            self._pool_filling.cancel()
+        if self._reaper is not None:
+            self._reaper.stop()
+            self._reaper = None
+        if self._sampler is not None:
+            self._sampler.stop()
+            self._sampler = None
+        if self._reaping is not None:
+            await asyncio.wait([self._reaping])
+        for task in list(self._polling.values()):
+            task.cancel()
+
+        config = dask.config.get("labextension.shutdown")
+        semaphore = asyncio.Semaphore(config["concurrency"])
+        timeout = parse_timedelta(config["timeout"])
+        failures: Dict[str, str] = dict()
+
+        # Let clusters that are starting finish, so that they can be closed.
+        if self._tasks:
+            tasks = dict(self._tasks)
+            await asyncio.wait(list(tasks.values()), timeout=timeout)
+            for cluster_id, task in tasks.items():
+                if not task.done():
+                    task.cancel()
+                    failures[cluster_id] = "timed out while starting"
+
+        async def close(cluster_id, cluster, close):
+            async with semaphore:
+                try:
+                    await asyncio.wait_for(close(), timeout)
+                    return
+                except asyncio.TimeoutError:
+                    failures[cluster_id] = f"timed out after {timeout}s"
+                except Exception as e:
+                    failures[cluster_id] = repr(e)
+                await _force_close(cluster, timeout)
+
+        pool = [entry[0] for entry in self._pool]
+        self._pool.clear()
+        await asyncio.gather(
+            *[
+                close(
+                    cluster_id,
+                    cluster,
+                    functools.partial(self.close_cluster, cluster_id),
+                )
+                for cluster_id, cluster in list(self._clusters.items())
+            ],
+            *[
+                close(f"warm-pool-{i}", cluster, functools.partial(_close, cluster))
+                for i, cluster in enumerate(pool)
+            ],
+        )
+        for cluster_id in list(self._clusters):
+            self._forget(cluster_id)
+
+        if failures:
+            logger.warning(
+                "Some Dask clusters did not close cleanly: "
+                + ", ".join(f"{k} ({v})" for k, v in failures.items())
+            )
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+        shutdown_executor()
+        return failures
 
     async def __aenter__(self):
         """
@@ -255,11 +1479,213 @@ class DaskClusterManager:
         return self.initialized.__await__()
 
 
+def get_executor() -> ThreadPoolExecutor:
+    """The thread pool for blocking calls into synchronous clusters."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=dask.config.get("labextension.executor.max-workers"),
+            thread_name_prefix="dask-labextension",
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """
+    Shut down the thread pool, without waiting for calls still running in it.
+    A new pool is created if it is needed again.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+async def run_in_executor(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking function in the thread pool, so that it doesn't stall
+    the event loop of the server.
+
+    Raises asyncio.TimeoutError if the call takes longer than the
+    `labextension.executor.timeout`. The thread is left to finish the call,
+    as it can't be interrupted, but the caller stops waiting for it.
+    """
+    return await asyncio.wait_for(_submit(func, *args, **kwargs), _executor_timeout())
+
+
+def _submit(func: Callable, *args, **kwargs) -> asyncio.Future:
+    """Run a blocking function in the thread pool, returning a future for it."""
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(
+        get_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+def _executor_timeout() -> float:
+    return parse_timedelta(dask.config.get("labextension.executor.timeout"))
+
+
+async def _wait_or_discard(
+    starting: "asyncio.Future[Cluster]", timeout: Union[float, None] = None
+) -> Cluster:
+    """
+    Wait for a cluster to start, for at most ``timeout`` seconds. If the wait
+    times out or is cancelled, the cluster is left to finish starting, and
+    then closed.
+    """
+    try:
+        return await asyncio.wait_for(asyncio.shield(starting), timeout)
+    except BaseException:
+        starting.add_done_callback(_discard_started)
+        raise
+
+
+def _discard_started(starting: "asyncio.Future[Cluster]") -> None:
+    if starting.cancelled() or starting.exception() is not None:
+        return
+    cluster = starting.result()
+    logger.info(f"Closing {type(cluster).__name__} that started too late")
+    task = asyncio.ensure_future(_close(cluster))
+    _discarding.add(task)
+    task.add_done_callback(_discarding.discard)
+
+
+@contextmanager
+def _blocking(description: str) -> Iterator[None]:
+    """Log a warning if the code in the block ran for too long on the event loop."""
+    threshold = parse_timedelta(
+        dask.config.get("labextension.executor.slow-call-threshold")
+    )
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        duration = time.monotonic() - start
+        if duration > threshold:
+            logger.warning(f"{description} blocked the event loop for {duration:.2f}s")
+
+
+def _is_asynchronous(cluster: Cluster) -> bool:
+    """Whether the methods of a cluster return awaitables rather than blocking."""
+    return getattr(cluster, "asynchronous", True)
+
+
+async def _call(cluster: Cluster, method: Callable, *args, **kwargs) -> Any:
+    """
+    Call a method of a cluster without blocking the event loop: awaiting it
+    if the cluster is asynchronous, or in the thread pool if it is not.
+    """
+    if not _is_asynchronous(cluster):
+        return await run_in_executor(method, *args, **kwargs)
+    with _blocking(f"{type(cluster).__name__}.{method.__name__}"):
+        r = method(*args, **kwargs)
+    if isawaitable(r):
+        r = await r
+    return r
+
+
+@timed("close")
+async def _close(cluster: Cluster) -> None:
+    """Close a cluster, whether or not it is asynchronous."""
+    await _call(cluster, cluster.close)
+
+
+async def _force_close(cluster: Cluster, timeout: Union[float, None]) -> None:
+    """
+    Tear down what we can of a cluster that failed to close cleanly,
+    killing its workers (or their processes) and then its scheduler.
+    """
+    workers = getattr(cluster, "workers", None)
+    parts = list(workers.values()) if isinstance(workers, dict) else []
+    scheduler = getattr(cluster, "scheduler", None)
+    if scheduler is not None:
+        parts.append(scheduler)
+    for part in parts:
+        stop = getattr(part, "kill", None) or getattr(part, "close", None)
+        if stop is None:
+            continue
+        try:
+            r = stop()
+            if isawaitable(r):
+                await asyncio.wait_for(r, timeout)
+        except Exception as e:
+            logger.debug(f"Failed to force close {part}: {e!r}")
+
+
+def _budget() -> Dict[str, Union[float, None]]:
+    """
+    The workers, threads and memory (in bytes) that the clusters of a
+    manager may have in all, from ``labextension.budget``, with None for
+    the resources that aren't limited.
+    """
+    config = dask.config.get("labextension.budget")
+    threads = config["threads"]
+    if threads == "auto":
+        threads = cpu_count()
+    memory = config["memory"]
+    if memory == "auto":
+        memory = memory_limit()
+    elif isinstance(memory, str):
+        memory = parse_bytes(memory)
+    return dict(workers=config["workers"], threads=threads, memory=memory)
+
+
+def cluster_activity(cluster: Cluster) -> Union[Tuple[int, int], None]:
+    """
+    The number of tasks processing or waiting to run on a cluster, and the
+    number of clients connected to it, or None if the scheduler of the
+    cluster isn't running in this process, and so can't be inspected.
+    """
+    scheduler = getattr(cluster, "scheduler", None)
+    clients = getattr(scheduler, "clients", None)
+    workers = getattr(scheduler, "workers", None)
+    if not isinstance(clients, dict) or not isinstance(workers, dict):
+        return None
+    tasks = sum(len(ws.processing) for ws in list(workers.values()))
+    tasks += len(getattr(scheduler, "queued", ()))
+    tasks += len(getattr(scheduler, "unrunnable", ()))
+    # The scheduler always has a client for fire-and-forget futures.
+    return tasks, len([c for c in clients if c != "fire-and-forget"])
+
+
+def _cluster_memory(cluster: Cluster) -> int:
+    """The total memory limit of the workers of a cluster."""
+    workers = cluster.scheduler_info["workers"].values()
+    return sum(d["memory_limit"] or 0 for d in workers)
+
+
+def dashboard_route(link: str) -> DashboardRoute:
+    """
+    Resolve a dashboard link to the host and port serving it.
+
+    Parameters
+    ----------
+    link: string
+        The dashboard link of a cluster.
+
+    Returns
+    route : a tuple of the dashboard hostname (None if malformed) and port,
+        or None if the link is relative.
+    """
+    if not link.startswith("http"):
+        return None
+    parsed = urlparse(link)
+    port = parsed.port
+    if not port:
+        port = 443 if parsed.scheme == "https" else 80
+    return parsed.hostname, port
+
+
+@timed("model")
 def make_cluster_model(
     cluster_id: str,
     cluster_name: str,
     cluster: Cluster,
     adaptive: Union[Adaptive, None],
+    status: str = "running",
+    idle_time: float = 0,
+    reap_reason: Union[str, None] = None,
+    sizing: Union[Sizing, None] = None,
 ) -> ClusterModel:
     """
     Make a cluster model. This is a JSON-serializable representation
@@ -279,6 +1705,18 @@ def make_cluster_model(
     adaptive: Adaptive
         The adaptive controller for the number of workers for the cluster, or
         none if the cluster is not scaled adaptively.
+
+    status: string
+        The lifecycle state of the cluster: "running" or "closing".
+
+    idle_time: float
+        How long the cluster has been idle, in seconds, as of the last check.
+
+    reap_reason: string
+        Why the cluster was last scaled down or closed for being idle, if it was.
+
+    sizing: dict
+        The sizing chosen for the cluster by ``labextension.sizing``, if any.
     """
     # This would be a great target for a dataclass
     # once python 3.7 is in wider use.
@@ -286,21 +1724,122 @@ def make_cluster_model(
         info = cluster.scheduler_info
     except AttributeError:
         info = cluster.scheduler.identity()
-    try:
-        cores = sum(d["nthreads"] for d in info["workers"].values())
-    except KeyError:  # dask.__version__ < 2.0
-        cores = sum(d["ncores"] for d in info["workers"].values())
     assert isinstance(info, dict)
+    # Aggregate the worker resources in a single pass,
+    # as clusters can have thousands of workers.
+    cores = 0
+    memory = 0
+    for d in info["workers"].values():
+        try:
+            cores += d["nthreads"]
+        except KeyError:  # dask.__version__ < 2.0
+            cores += d["ncores"]
+        memory += d["memory_limit"]
     model = dict(
         id=cluster_id,
         name=cluster_name,
         scheduler_address=cluster.scheduler_address,
         dashboard_link=cluster.dashboard_link or "",
         workers=len(info["workers"]),
-        memory=format_bytes(sum(d["memory_limit"] for d in info["workers"].values())),
+        memory=format_bytes(memory),
+        memory_limit=memory,
+        **worker_usage(cluster, info),
         cores=cores,
+        status=status,
+        error=None,
+        stale=False,
+        idle_time=idle_time,
+        reap_reason=reap_reason,
+        sizing=sizing,
     )
     if adaptive:
         model["adapt"] = {"minimum": adaptive.minimum, "maximum": adaptive.maximum}
 
     return model
+
+
+def worker_usage(cluster: Cluster, info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The resources in use by the workers of a cluster: the memory managed by
+    Dask, unmanaged and spilled to disk (in bytes), the tasks processing on
+    the workers and queued on the scheduler, and the summed CPU use of the
+    workers (in percent).
+
+    These are read from the state of the scheduler if it is in this
+    process, and otherwise from the worker metrics in its scheduler info.
+    Those that can't be told are None.
+
+    Parameters
+    ----------
+    cluster: Cluster
+        The cluster whose workers to look at.
+
+    info: dict
+        The scheduler info of the cluster.
+    """
+    usage: Dict[str, Any] = dict.fromkeys(USAGE, 0)
+    scheduler = getattr(cluster, "scheduler", None)
+    workers = getattr(scheduler, "workers", None)
+    if isinstance(workers, dict) and hasattr(scheduler, "queued"):
+        for ws in list(workers.values()):
+            memory = ws.memory
+            usage["memory_managed"] += memory.managed
+            usage["memory_unmanaged"] += memory.unmanaged
+            usage["memory_spilled"] += memory.spilled
+            usage["tasks_processing"] += len(ws.processing)
+            usage["cpu"] += ws.metrics.get("cpu", 0)
+        usage["tasks_queued"] = len(scheduler.queued) + len(scheduler.unrunnable)
+    else:
+        metrics = [d["metrics"] for d in info["workers"].values() if "metrics" in d]
+        if len(metrics) < len(info["workers"]):
+            return dict.fromkeys(USAGE, None)
+        for m in metrics:
+            managed = m.get("managed_bytes", 0)
+            usage["memory_managed"] += managed
+            usage["memory_unmanaged"] += max(0, m.get("memory", 0) - managed)
+            spilled = m.get("spilled_bytes", 0)
+            if isinstance(spilled, dict):
+                spilled = spilled.get("disk", 0)
+            usage["memory_spilled"] += spilled
+            counts = m.get("task_counts", m)
+            usage["tasks_processing"] += counts.get("executing", 0)
+            usage["tasks_processing"] += counts.get("ready", 0)
+            usage["cpu"] += m.get("cpu", 0)
+        # The scheduler's queue isn't part of its info.
+        usage["tasks_queued"] = None
+    usage["cpu"] = round(usage["cpu"], 1)
+    return usage
+
+
+def make_pending_model(cluster_id: str, cluster_name: str, status: str) -> ClusterModel:
+    """
+    Make a model for a cluster that has not (or not yet) started.
+
+    Parameters
+    ----------
+    cluster_id: string
+        A unique string for the cluster.
+
+    cluster_name: string
+        A display name for the cluster.
+
+    status: string
+        The lifecycle state of the cluster: "starting", "closing" or "failed".
+    """
+    return dict(
+        id=cluster_id,
+        name=cluster_name,
+        scheduler_address="",
+        dashboard_link="",
+        workers=0,
+        memory=format_bytes(0),
+        memory_limit=0,
+        **dict.fromkeys(USAGE, 0),
+        cores=0,
+        status=status,
+        error=None,
+        stale=False,
+        idle_time=0,
+        reap_reason=None,
+        sizing=None,
+    )
@@ -0,0 +1,186 @@
+"""Prometheus metrics for the hot paths of the Dask labextension."""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+import functools
+from collections import Counter as _Counter
+from time import perf_counter
+from typing import Callable, Iterator
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily, Metric
+from prometheus_client.exposition import generate_latest
+
+# A registry of our own, so that the extension's metrics are
+# served apart from those of the Jupyter server.
+REGISTRY = CollectorRegistry(auto_describe=True)
+
+# From a millisecond (building a model) to minutes (starting a cluster).
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, float("inf"))
+
+OPERATION_SECONDS = Histogram(
+    "dask_labextension_operation_seconds",
+    "Time spent in cluster operations and dashboard checks.",
+    ["operation"],
+    buckets=BUCKETS,
+    registry=REGISTRY,
+)
+OPERATION_FAILURES = Counter(
+    "dask_labextension_operation_failures",
+    "Cluster operations and dashboard checks that raised an error.",
+    ["operation"],
+    registry=REGISTRY,
+)
+CACHE_REQUESTS = Counter(
+    "dask_labextension_cache_requests",
+    "Lookups in the extension's caches, by whether they were hits or misses.",
+    ["cache", "result"],
+    registry=REGISTRY,
+)
+PROXY_SECONDS = Histogram(
+    "dask_labextension_proxy_seconds",
+    "Time taken to proxy HTTP requests to cluster dashboards.",
+    ["cluster"],
+    buckets=BUCKETS,
+    registry=REGISTRY,
+)
+PROXY_BYTES = Counter(
+    "dask_labextension_proxy_bytes",
+    "Bytes proxied from cluster dashboards, before (raw) and after (sent) "
+    "compression.",
+    ["cluster", "protocol", "stage"],
+    registry=REGISTRY,
+)
+PROXY_WEBSOCKETS = Gauge(
+    "dask_labextension_proxy_websockets",
+    "Open websockets proxied to cluster dashboards.",
+    ["cluster"],
+    registry=REGISTRY,
+)
+
+
+def timed(operation: str) -> Callable[[Callable], Callable]:
+    """
+    Decorate a function or coroutine function to record how long its
+    calls take, and how many of them fail, under an operation name.
+    """
+    seconds = OPERATION_SECONDS.labels(operation)
+    failures = OPERATION_FAILURES.labels(operation)
+
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    failures.inc()
+                    raise
+                finally:
+                    seconds.observe(perf_counter() - start)
+
+        else:
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    failures.inc()
+                    raise
+                finally:
+                    seconds.observe(perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def cache_counters(cache: str) -> Callable[[bool], None]:
+    """
+    Get a function recording whether a lookup in a cache was a hit.
+    """
+    hit = CACHE_REQUESTS.labels(cache, "hit")
+    miss = CACHE_REQUESTS.labels(cache, "miss")
+
+    def record(is_hit: bool) -> None:
+        (hit if is_hit else miss).inc()
+
+    return record
+
+
+def record_proxy_bytes(cluster_id: str, protocol: str, raw: int, sent: int) -> None:
+    """Record the bytes of a proxied response or websocket."""
+    PROXY_BYTES.labels(cluster_id, protocol, "raw").inc(raw)
+    PROXY_BYTES.labels(cluster_id, protocol, "sent").inc(sent)
+
+
+def forget_proxy_metrics(cluster_id: str) -> None:
+    """Remove the proxy metrics of a cluster, once it is closed."""
+    series = [(PROXY_SECONDS, (cluster_id,)), (PROXY_WEBSOCKETS, (cluster_id,))]
+    for protocol in ["http", "websocket"]:
+        for stage in ["raw", "sent"]:
+            series.append((PROXY_BYTES, (cluster_id, protocol, stage)))
+    for metric, labels in series:
+        try:
+            metric.remove(*labels)
+        except KeyError:
+            pass
+
+
+class ManagerCollector:
+    """
+    Collects the number of clusters, and the workers, cores and memory of
+    each, from the models most recently built by a cluster manager.
+    Scraping doesn't rebuild the models.
+    """
+
+    def __init__(self, manager) -> None:
+        self.manager = manager
+
+    def collect(self) -> Iterator[Metric]:
+        models = self.manager.models
+        clusters = GaugeMetricFamily(
+            "dask_labextension_clusters",
+            "Clusters managed by the extension, by status.",
+            labels=["status"],
+        )
+        for status, n in sorted(_Counter(m["status"] for m in models).items()):
+            clusters.add_metric([status], n)
+        yield clusters
+
+        labels = ["cluster", "name"]
+        workers = GaugeMetricFamily(
+            "dask_labextension_cluster_workers", "Workers of a cluster.", labels=labels
+        )
+        cores = GaugeMetricFamily(
+            "dask_labextension_cluster_cores",
+            "Threads of the workers of a cluster.",
+            labels=labels,
+        )
+        memory = GaugeMetricFamily(
+            "dask_labextension_cluster_memory_bytes",
+            "Memory limit of the workers of a cluster.",
+            labels=labels,
+        )
+        for model in models:
+            values = [model["id"], model["name"]]
+            workers.add_metric(values, model["workers"])
+            cores.add_metric(values, model["cores"])
+            memory.add_metric(values, model["memory_limit"])
+        yield workers
+        yield cores
+        yield memory
+
+
+def generate_metrics(manager) -> bytes:
+    """
+    Render the extension's metrics, and those of the clusters
+    of a manager, in the Prometheus text format.
+    """
+    return generate_latest(REGISTRY) + generate_latest(ManagerCollector(manager))
@@ -0,0 +1,38 @@
+"""Tornado handler for the metrics of the Dask labextension."""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+from inspect import isawaitable
+
+from prometheus_client.exposition import CONTENT_TYPE_LATEST
+from tornado import web
+from jupyter_server.base.handlers import APIHandler
+
+from .manager import DaskClusterManager
+from .metrics import generate_metrics
+
+
+class DaskMetricsHandler(APIHandler):
+    """
+    A tornado HTTP handler serving the extension's metrics
+    in the Prometheus text format.
+    """
+
+    manager: DaskClusterManager
+
+    async def prepare(self):
+        r = super().prepare()
+        if isawaitable(r):
+            await r
+        self.manager = await self.settings["dask_cluster_manager"]
+
+    @web.authenticated
+    def get(self) -> None:
+        """
+        Get the timings of cluster operations, dashboard checks and proxied
+        requests, the bytes and websockets proxied for each cluster, cache
+        hits and misses, and the workers, cores and memory of each cluster.
+        """
+        self.set_header("Content-Type", CONTENT_TYPE_LATEST)
+        self.finish(generate_metrics(self.manager))
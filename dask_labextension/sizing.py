@@ -0,0 +1,186 @@
+"""Sizing local clusters to the CPUs, memory and NUMA nodes of the machine."""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import logging
+import math
+import os
+import re
+from typing import Any, Dict, List, Tuple, Union
+
+from dask.system import cpu_count
+from dask.utils import parse_bytes
+from distributed.deploy.utils import nprocesses_nthreads
+from distributed.system import memory_limit
+
+logger = logging.getLogger(__name__)
+
+NODE_PATH = "/sys/devices/system/node"
+
+# A type for the sizing chosen for a cluster.
+Sizing = Dict[str, Any]
+
+
+def parse_cpulist(text: str) -> List[int]:
+    """
+    Parse a Linux CPU list, such as ``"0-3,8-11"``, into a list of CPUs.
+    """
+    cpus: List[int] = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cpus.extend(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+def _allowed_cpus() -> List[int]:
+    """The CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def numa_nodes(path: str = NODE_PATH) -> List[List[int]]:
+    """
+    The CPUs of each NUMA node that this process may run on, or all of
+    its CPUs as a single node if the NUMA topology isn't known.
+
+    Parameters
+    ----------
+    path: string
+        The sysfs directory describing the NUMA nodes of the machine.
+    """
+    allowed = _allowed_cpus()
+    nodes = []
+    try:
+        entries = [e for e in os.listdir(path) if re.fullmatch(r"node\d+", e)]
+    except OSError:
+        entries = []
+    for entry in sorted(entries, key=lambda e: int(e[4:])):
+        try:
+            with open(os.path.join(path, entry, "cpulist")) as f:
+                cpus = parse_cpulist(f.read())
+        except (OSError, ValueError):
+            continue
+        cpus = [cpu for cpu in cpus if cpu in allowed]
+        if cpus:
+            nodes.append(cpus)
+    return nodes or [allowed]
+
+
+def auto_sizing(
+    cpus: Union[int, None] = None,
+    memory: Union[int, None] = None,
+    nodes: Union[List[List[int]], None] = None,
+) -> Sizing:
+    """
+    Choose the number of workers, threads per worker and memory limit
+    of a local cluster from the resources of the machine.
+
+    The workers are spread evenly over the NUMA nodes, and within each
+    node the CPUs are split between workers and threads as LocalCluster
+    does. The memory is split evenly between the workers.
+
+    Parameters
+    ----------
+    cpus: int
+        The number of CPUs to use. Defaults to those available to this
+        process, taking its CPU affinity and cgroup CPU quota into account.
+
+    memory: int
+        The memory to use, in bytes. Defaults to the memory available to
+        this process, taking cgroup and rlimit memory limits into account.
+
+    nodes: list of lists of ints
+        The CPUs of each NUMA node. Defaults to those found by `numa_nodes`.
+
+    Returns
+    sizing : a dict with the chosen ``workers``, ``threads_per_worker`` and
+        ``memory_limit`` (per worker, in bytes), and the ``cpus``, ``memory``
+        and ``numa_nodes`` they were chosen from.
+    """
+    cpus = cpus or cpu_count()
+    memory = memory or memory_limit()
+    nodes = numa_nodes() if nodes is None else nodes
+    # A cgroup CPU quota may leave fewer CPUs than there are nodes.
+    n_nodes = max(1, min(len(nodes), cpus))
+    per_node, threads = nprocesses_nthreads(max(1, cpus // n_nodes))
+    workers = per_node * n_nodes
+    return dict(
+        workers=workers,
+        threads_per_worker=threads,
+        memory_limit=memory // workers,
+        cpus=cpus,
+        memory=memory,
+        numa_nodes=n_nodes,
+    )
+
+
+def sizing_kwargs(sizing: Sizing, pin: bool = False) -> Dict[str, Any]:
+    """
+    The LocalCluster keyword arguments for a sizing. If ``pin`` is true,
+    and the sizing spans several NUMA nodes, each worker process is pinned
+    to the CPUs of one node by preloading this module in the workers.
+    """
+    kwargs: Dict[str, Any] = dict(
+        n_workers=sizing["workers"],
+        threads_per_worker=sizing["threads_per_worker"],
+        memory_limit=sizing["memory_limit"],
+    )
+    if pin and sizing["numa_nodes"] > 1:
+        kwargs["preload"] = [__name__]
+    return kwargs
+
+
+def estimate_workers(
+    kwargs: Dict[str, Any], local: bool = True
+) -> Tuple[int, int, int]:
+    """
+    Estimate the number of workers a cluster starts with, and the threads
+    and memory limit (in bytes) of each, from its keyword arguments, the way
+    LocalCluster chooses them. For other cluster classes (``local=False``)
+    only the arguments given are used, with 0 for what isn't known.
+    """
+    n = kwargs.get("n_workers")
+    threads = kwargs.get("threads_per_worker")
+    memory = kwargs.get("memory_limit", "auto")
+    if local:
+        cpus = cpu_count()
+        processes = kwargs.get("processes", True)
+        if n is None and threads is None:
+            n, threads = nprocesses_nthreads(cpus) if processes else (1, cpus)
+        elif n is None:
+            n = max(1, cpus // threads) if processes else 1
+        elif threads is None and n:
+            threads = max(1, math.ceil(cpus / n))
+        if memory == "auto" and n:
+            memory = memory_limit() // n
+    if memory == "auto" or not memory:
+        memory = 0
+    elif isinstance(memory, str):
+        memory = parse_bytes(memory)
+    elif memory <= 1:
+        memory = memory * memory_limit()
+    return int(n or 0), int(threads or 0), int(memory)
+
+
+def dask_setup(worker) -> None:
+    """
+    Pin a worker process to the CPUs of a NUMA node, chosen round-robin
+    by the worker's name. This is run in each worker that preloads this
+    module, as set up by `sizing_kwargs`.
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    nodes = numa_nodes()
+    try:
+        index = int(worker.name)
+    except (TypeError, ValueError):
+        index = sum(str(worker.name).encode())
+    cpus = nodes[index % len(nodes)]
+    try:
+        os.sched_setaffinity(0, cpus)
+    except OSError as e:
+        logger.warning(f"Failed to pin worker {worker.name} to CPUs {cpus}: {e!r}")
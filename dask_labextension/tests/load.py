@@ -0,0 +1,338 @@
+"""
+A load test of the extension's REST API and dashboard handlers.
+
+Many simulated browser tabs concurrently create, list, scale, adapt and
+delete fast fake clusters, check dashboards and fetch dashboard assets,
+against a Jupyter server running the extension in this process. The
+latencies of each kind of request, the throughput, and any violated
+invariants (server errors, malformed models, state left behind in the
+manager, unclosed clusters) are reported. Run it with::
+
+    python -m dask_labextension.tests.load --clients 50 --duration 30
+
+It needs no network access beyond the loopback interface.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Union
+from urllib.parse import quote
+
+import dask
+
+from .utils import FakeCluster, fake_cluster_config, serve_dashboard, serve_jupyter
+
+MODEL_KEYS = {
+    "id",
+    "name",
+    "scheduler_address",
+    "dashboard_link",
+    "workers",
+    "memory",
+    "cores",
+    "status",
+    "error",
+    "stale",
+    "memory_managed",
+    "memory_unmanaged",
+    "memory_spilled",
+    "tasks_processing",
+    "tasks_queued",
+    "cpu",
+}
+STATUSES = {"starting", "running", "closing", "failed"}
+
+
+class LoadResult:
+    """The latencies of the requests made by a load test, and any violations."""
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.codes: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.violations: List[str] = []
+        self.duration = 0.0
+
+    def record(self, operation: str, seconds: float, code: int) -> None:
+        self.latencies[operation].append(seconds)
+        self.codes[operation][code] += 1
+
+    @property
+    def requests(self) -> int:
+        return sum(len(latencies) for latencies in self.latencies.values())
+
+    def report(self) -> str:
+        lines = [
+            f"{'operation':<24}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}  codes",
+        ]
+        for operation in sorted(self.latencies):
+            latencies = sorted(self.latencies[operation])
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] * 1000
+            codes = ", ".join(
+                f"{code}: {n}" for code, n in sorted(self.codes[operation].items())
+            )
+            lines.append(
+                f"{operation:<24}{len(latencies):>8}{p50:>10.1f}{p99:>10.1f}  {codes}"
+            )
+        lines.append(
+            f"{self.requests} requests in {self.duration:.1f}s "
+            f"({self.requests / max(self.duration, 1e-9):.0f} requests/s)"
+        )
+        lines.append(f"{len(self.violations)} invariant violations")
+        lines.extend(f"  {violation}" for violation in self.violations[:50])
+        return "\n".join(lines)
+
+
+class _Tab:
+    """A simulated browser tab making random requests."""
+
+    def __init__(self, server, dashboard: str, ids: List[str], result, rng) -> None:
+        self.server = server
+        self.dashboard = dashboard
+        self.ids = ids
+        self.result = result
+        self.rng = rng
+        self.etag: Union[str, None] = None
+
+    async def request(self, operation: str, path: str, expected, **kwargs):
+        start = time.monotonic()
+        response = await self.server.fetch(path, **kwargs)
+        self.result.record(operation, time.monotonic() - start, response.code)
+        if response.code not in expected:
+            body = (response.body or b"")[:200].decode(errors="replace")
+            self.result.violations.append(
+                f"{operation}: unexpected {response.code} from {path}: {body}"
+            )
+        return response
+
+    def check_model(self, operation: str, model) -> None:
+        if not isinstance(model, dict) or not MODEL_KEYS <= set(model):
+            self.result.violations.append(f"{operation}: malformed model {model!r}")
+        elif model["status"] not in STATUSES:
+            self.result.violations.append(
+                f"{operation}: unknown status {model['status']!r}"
+            )
+        elif model["id"] not in self.ids:
+            self.ids.append(model["id"])
+
+    def pick(self) -> str:
+        # Favour a few clusters, so that tabs race on the same ones.
+        if not self.ids:
+            return "missing"
+        if self.rng.random() < 0.5:
+            return self.rng.choice(self.ids[:3])
+        return self.rng.choice(self.ids)
+
+    async def create(self):
+        response = await self.request(
+            "PUT cluster", "dask/clusters", {200}, method="PUT", body=""
+        )
+        if response.code == 200:
+            self.check_model("PUT cluster", json.loads(response.body))
+
+    async def list(self):
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        response = await self.request(
+            "GET clusters", "dask/clusters", {200, 304}, headers=headers
+        )
+        if response.code == 200:
+            self.etag = response.headers.get("Etag")
+            for model in json.loads(response.body):
+                self.check_model("GET clusters", model)
+
+    async def get(self):
+        response = await self.request(
+            "GET cluster", f"dask/clusters/{self.pick()}", {200, 404}
+        )
+        if response.code == 200:
+            self.check_model("GET cluster", json.loads(response.body))
+
+    async def scale(self):
+        body = json.dumps({"workers": self.rng.randint(0, 20), "adapt": None})
+        response = await self.request(
+            "PATCH scale",
+            f"dask/clusters/{self.pick()}",
+            {200, 404},
+            method="PATCH",
+            body=body,
+        )
+        if response.code == 200:
+            self.check_model("PATCH scale", json.loads(response.body))
+
+    async def adapt(self):
+        minimum = self.rng.randint(0, 5)
+        body = json.dumps({"adapt": {"minimum": minimum, "maximum": minimum + 10}})
+        response = await self.request(
+            "PATCH adapt",
+            f"dask/clusters/{self.pick()}",
+            {200, 404},
+            method="PATCH",
+            body=body,
+        )
+        if response.code == 200:
+            self.check_model("PATCH adapt", json.loads(response.body))
+
+    async def delete(self):
+        await self.request(
+            "DELETE cluster",
+            f"dask/clusters/{self.pick()}",
+            {204, 404},
+            method="DELETE",
+        )
+
+    async def check_dashboard(self):
+        url = quote(self.dashboard, safe="")
+        response = await self.request(
+            "GET dashboard-check", f"dask/dashboard-check/{url}", {200}
+        )
+        if response.code == 200 and not json.loads(response.body)["isActive"]:
+            self.result.violations.append("GET dashboard-check: dashboard not found")
+
+    async def check_dashboards(self):
+        body = json.dumps({"urls": [self.dashboard, "http://127.0.0.1:1/missing"]})
+        await self.request(
+            "POST dashboard-check",
+            "dask/dashboard-check",
+            {200},
+            method="POST",
+            body=body,
+        )
+
+    async def fetch_asset(self):
+        # A starting or deleted cluster has no dashboard yet.
+        await self.request(
+            "GET dashboard asset",
+            f"dask/dashboard/{self.pick()}/statics/js/bokeh.min.js?v=1",
+            {200, 404},
+        )
+
+    async def run(self, deadline: float) -> None:
+        operations = [
+            (self.create, 2),
+            (self.list, 20),
+            (self.get, 10),
+            (self.scale, 8),
+            (self.adapt, 4),
+            (self.delete, 2),
+            (self.check_dashboard, 4),
+            (self.check_dashboards, 1),
+            (self.fetch_asset, 4),
+        ]
+        functions = [f for f, _ in operations]
+        weights = [w for _, w in operations]
+        while time.monotonic() < deadline:
+            await self.rng.choices(functions, weights)[0]()
+
+
+async def _check_manager(server, result: LoadResult) -> None:
+    """Check that the manager's state is consistent once the load is over."""
+    manager = await server.manager
+    start = time.monotonic()
+    while manager._tasks and time.monotonic() < start + 10:
+        await asyncio.sleep(0.01)
+
+    violations = result.violations
+    response = await server.fetch("dask/clusters")
+    listed = {model["id"] for model in json.loads(response.body)}
+    known = set(manager._clusters) | set(manager._pending)
+    if listed != known:
+        violations.append(f"listed clusters {listed} != managed clusters {known}")
+    for name in ["_closing", "_queued", "_tasks"]:
+        if getattr(manager, name):
+            violations.append(f"manager.{name} not empty: {getattr(manager, name)}")
+    for name in ["_locks", "_routes", "_adaptives", "_cluster_names", "_timeseries"]:
+        extra = set(getattr(manager, name)) - set(manager._clusters)
+        if extra:
+            violations.append(f"manager.{name} has closed clusters {extra}")
+    if set(manager._models) != known:
+        violations.append(f"cached models {set(manager._models)} != {known}")
+    for cluster_id, cluster in manager._clusters.items():
+        if cluster.status != "running":
+            violations.append(f"cluster {cluster_id} is {cluster.status}")
+
+    # Everything should be closed once the clusters are deleted.
+    for cluster_id in list(known):
+        await server.fetch(f"dask/clusters/{cluster_id}", method="DELETE")
+    leaked = [c for c in FakeCluster.instances if c.status != "closed"]
+    if leaked:
+        violations.append(f"{len(leaked)} clusters were not closed")
+    if manager.models:
+        violations.append(f"models left after deleting all clusters: {manager.models}")
+
+
+async def run_load(
+    clients: int = 10,
+    duration: float = 10.0,
+    workers: int = 10,
+    delay: float = 0.01,
+    seed: Union[int, None] = None,
+) -> LoadResult:
+    """
+    Run a load test.
+
+    Parameters
+    ----------
+    clients: int
+        The number of simulated browser tabs making requests concurrently.
+
+    duration: float
+        How long to make requests for, in seconds.
+
+    workers: int
+        The number of workers each fake cluster starts with.
+
+    delay: float
+        How long starting, scaling and closing each fake cluster takes.
+
+    seed: int
+        A seed for the random choice of requests.
+
+    Returns
+    result : the latencies of the requests, and any invariant violations.
+    """
+    rng = random.Random(seed)
+    result = LoadResult()
+    ids: List[str] = []
+    FakeCluster.instances.clear()
+    async with serve_dashboard() as dashboard:
+        config = dask.config.merge(
+            fake_cluster_config(
+                n_workers=workers, delay=delay, dashboard_link=f"{dashboard}/status"
+            ),
+            # Check the dashboard for every request, to load the upstream client.
+            {"labextension": {"dashboard-check": {"ttl": 0, "inactive-ttl": 0}}},
+        )
+        async with serve_jupyter(config) as server:
+            tabs = [
+                _Tab(server, dashboard, ids, result, random.Random(rng.random()))
+                for _ in range(clients)
+            ]
+            start = time.monotonic()
+            await asyncio.gather(*(tab.run(start + duration) for tab in tabs))
+            result.duration = time.monotonic() - start
+            await _check_manager(server, result)
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    result = asyncio.run(
+        run_load(args.clients, args.duration, args.workers, args.delay, args.seed)
+    )
+    print(result.report())
+    return 1 if result.violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import json
+
+from distributed.utils_test import gen_test
+
+from .utils import fake_cluster_config, serve_jupyter
+
+
+@gen_test(timeout=60)
+async def test_budget():
+    config = fake_cluster_config(n_workers=2)
+    config["labextension"]["budget"].update(workers=3, policy="reject")
+    async with serve_jupyter(config) as server:
+        model = await (await server.manager).start_cluster()
+        response = await server.fetch("dask/clusters")
+        headroom = json.loads(response.headers["Dask-Headroom"])
+        assert headroom == {"workers": 1, "threads": None, "memory": None}
+
+        body = json.dumps({"workers": 4, "adapt": None})
+        path = f"dask/clusters/{model['id']}"
+        response = await server.fetch(path, method="PATCH", body=body)
+        assert response.code == 409
+        assert "budget" in json.loads(response.body)["message"]
+
+        body = json.dumps({"workers": 3, "adapt": None})
+        response = await server.fetch(path, method="PATCH", body=body)
+        assert json.loads(response.body)["workers"] == 3
+
+
+@gen_test(timeout=60)
+async def test_etag():
+    async with serve_jupyter(fake_cluster_config()) as server:
+        manager = await server.manager
+        model = await manager.start_cluster()
+        path = f"dask/clusters/{model['id']}"
+        response = await server.fetch(path)
+        etag = response.headers["Etag"]
+        assert etag.startswith('W/"')
+
+        # The usage fields may change under the same (weak) ETag.
+        manager._update_model(dict(model, cpu=model["cpu"] + 100))
+        response = await server.fetch(path, headers={"If-None-Match": etag})
+        assert response.code == 304
+        response = await server.fetch(path)
+        assert response.headers["Etag"] == etag
+        assert json.loads(response.body)["cpu"] >= 100
@@ -0,0 +1,175 @@
+import asyncio
+import gzip
+import json
+from urllib import parse
+
+import dask
+from tornado.httputil import HTTPHeaders, HTTPServerRequest
+from distributed.utils_test import gen_test
+
+from dask_labextension.config import defaults
+from dask_labextension.dashboardhandler import (
+    CompressionTransform,
+    DashboardCheckCache,
+    StaticAssetCache,
+    static_asset_key,
+    upstream_client,
+)
+
+from .utils import fake_cluster_config, serve_dashboard, serve_jupyter
+
+
+config = dask.config.merge(
+    defaults,
+    {"labextension": {"dashboard-check": {"ttl": "1 hour", "inactive-ttl": 0}}},
+)
+
+
+@gen_test()
+async def test_dashboard_check_cache():
+    with dask.config.set(config):
+        cache = DashboardCheckCache()
+        calls = []
+
+        async def check(active=True):
+            calls.append(active)
+            await asyncio.sleep(0.1)
+            return {"url": "http://dashboard", "isActive": active, "plots": {}}
+
+        # concurrent checks share a single fetch
+        results = await asyncio.gather(*[cache.get("a", check) for _ in range(5)])
+        assert len(calls) == 1
+        assert all(r["isActive"] for r in results)
+
+        # fresh results are served from the cache
+        await cache.get("a", check)
+        assert len(calls) == 1
+
+        # inactive results are not cached with a zero inactive-ttl
+        await cache.get("b", lambda: check(active=False))
+        await cache.get("b", lambda: check(active=False))
+        assert len(calls) == 3
+
+
+@gen_test()
+async def test_upstream_client():
+    with dask.config.set(config):
+        settings = {}
+        client = upstream_client(settings)
+        assert upstream_client(settings) is client
+        assert client.max_clients == 20
+        assert client.defaults["connect_timeout"] == 10
+        client.close()
+
+
+def test_static_asset_key():
+    path = "/statics/js/bokeh.min.js"
+    # Versioned assets are shared between dashboards
+    assert static_asset_key("a", 8787, path, "v=abc") == static_asset_key(
+        "b", 8788, path, "v=abc"
+    )
+    assert static_asset_key("a", 8787, path, "v=abc") != static_asset_key(
+        "a", 8787, path, "v=def"
+    )
+    # Unversioned assets are not
+    assert static_asset_key("a", 8787, path, "") != static_asset_key(
+        "b", 8787, path, ""
+    )
+    assert static_asset_key("a", 8787, "/status", "") is None
+
+
+def test_static_asset_cache():
+    with dask.config.set(
+        dask.config.merge(
+            defaults, {"labextension": {"static-cache": {"max-size": 10}}}
+        )
+    ):
+        cache = StaticAssetCache()
+        cache.put(("v", "a"), ("text/css", b"aaaa", '"a"'))
+        cache.put(("v", "b"), ("text/css", b"bbbb", '"b"'))
+        assert cache.nbytes == 8
+
+        # The least recently used asset is evicted first
+        assert cache.get(("v", "a"))[1] == b"aaaa"
+        cache.put(("v", "c"), ("text/css", b"cccc", '"c"'))
+        assert cache.get(("v", "b")) is None
+        assert cache.get(("v", "a")) is not None
+        assert len(cache) == 2
+        assert cache.nbytes == 8
+
+        # Assets bigger than the cache aren't cached
+        cache.put(("v", "d"), ("text/css", b"d" * 11, '"d"'))
+        assert cache.get(("v", "d")) is None
+        assert len(cache) == 2
+
+
+def test_compression_transform():
+    def transform(body, headers=(), accept="gzip", **compression):
+        request = HTTPServerRequest(
+            method="GET", uri="/", headers=HTTPHeaders({"Accept-Encoding": accept})
+        )
+        with dask.config.set(
+            dask.config.merge(defaults, {"labextension": {"compression": compression}})
+        ):
+            t = CompressionTransform(request)
+        headers = HTTPHeaders({"Content-Type": "application/json", **dict(headers)})
+        _, headers, chunk = t.transform_first_chunk(200, headers, body, True)
+        return t, headers, chunk
+
+    body = b'{"data": [' + b"1, " * 1000 + b"1]}"
+    t, headers, chunk = transform(body)
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(chunk) == body
+    assert t.raw_bytes == len(body)
+    assert t.sent_bytes == len(chunk) < len(body)
+
+    # Short, already compressed, unaccepted and disabled compression
+    for t, headers, chunk in [
+        transform(body, **{"min-length": "1 MiB"}),
+        transform(body, headers={"Content-Encoding": "br"}),
+        transform(body, accept="identity"),
+        transform(body, level=0),
+    ]:
+        assert chunk == body
+        assert t.raw_bytes == t.sent_bytes == len(body)
+
+
+@gen_test(timeout=60)
+async def test_dashboard_check_handler():
+    async with serve_dashboard() as dashboard, serve_jupyter(
+        fake_cluster_config()
+    ) as server:
+        url = parse.quote(dashboard, safe="")
+        response = await server.fetch(f"dask/dashboard-check/{url}")
+        assert json.loads(response.body)["isActive"]
+
+        body = json.dumps({"urls": [dashboard]})
+        response = await server.fetch("dask/dashboard-check", method="POST", body=body)
+        assert [r["isActive"] for r in json.loads(response.body)] == [True]
+
+        # The route for POSTing a list of urls doesn't take a GET.
+        response = await server.fetch("dask/dashboard-check")
+        assert response.code == 400
+
+
+@gen_test(timeout=60)
+async def test_dashboard_check_starting():
+    async with serve_dashboard() as dashboard, serve_jupyter(
+        dask.config.merge(
+            fake_cluster_config(dashboard_link=dashboard, delay=0.5),
+            {"labextension": {"dashboard-check": {"inactive-ttl": "1 hour"}}},
+        )
+    ) as server:
+        manager = await server.manager
+        model = await manager.create_cluster()
+        proxied = f"{server.url}dask/dashboard/{model['id']}?token=secret"
+        url = parse.quote(proxied, safe="")
+
+        # The dashboard of a cluster that is starting isn't found, but that
+        # isn't cached, so it is found as soon as the cluster is running.
+        response = await server.fetch(f"dask/dashboard-check/{url}")
+        assert not json.loads(response.body)["isActive"]
+        while (await manager.get_cluster(model["id"]))["status"] == "starting":
+            await asyncio.sleep(0.05)
+        response = await server.fetch(f"dask/dashboard-check/{url}")
+        assert json.loads(response.body)["isActive"]
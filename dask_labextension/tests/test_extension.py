@@ -0,0 +1,28 @@
+import subprocess
+import sys
+
+CHECK_IMPORTS = """
+import sys
+from types import SimpleNamespace
+from tornado import web
+from dask_labextension import load_jupyter_server_extension
+
+load_jupyter_server_extension(
+    SimpleNamespace(web_app=web.Application(base_url="/"))
+)
+heavy = ["dask", "distributed", "jupyter_server_proxy", "yaml"]
+print(" ".join(m for m in heavy if m in sys.modules))
+"""
+
+
+def test_lazy_imports():
+    # Loading the extension doesn't import dask, distributed or the proxy.
+    output = subprocess.check_output([sys.executable, "-c", CHECK_IMPORTS], text=True)
+    assert output.strip() == ""
+
+
+def test_exports():
+    import dask_labextension
+    from dask_labextension.manager import DaskClusterManager
+
+    assert dask_labextension.DaskClusterManager is DaskClusterManager
@@ -0,0 +1,10 @@
+from distributed.utils_test import gen_test
+
+from .load import run_load
+
+
+@gen_test(timeout=120)
+async def test_load():
+    result = await run_load(clients=10, duration=2, seed=0)
+    assert result.requests > 0
+    assert not result.violations, result.report()
@@ -1,3 +1,6 @@
+import asyncio
+from time import sleep as sleep_thread
+
 import pytest
 from tornado.gen import sleep
 
@@ -5,21 +8,27 @@ import dask
 from distributed.utils_test import gen_test
 from distributed.metrics import time
 
+from dask_labextension.config import defaults
 from dask_labextension.manager import DaskClusterManager
 
+from .utils import FakeCluster, fake_cluster_config
 
-config = {
-    "labextension": {
-        "initial": [],
-        "default": {},
-        "factory": {
-            "module": "dask.distributed",
-            "class": "LocalCluster",
-            "kwargs": {"processes": False},
-            "args": [],
-        },
-    }
-}
+
+config = dask.config.merge(
+    defaults,
+    {
+        "labextension": {
+            "initial": [],
+            "default": {},
+            "factory": {
+                "module": "dask.distributed",
+                "class": "LocalCluster",
+                "kwargs": {"processes": False},
+                "args": [],
+            },
+        }
+    },
+)
 
 
 @gen_test()
@@ -126,21 +135,178 @@ async def test_adapt():
             assert adapt["maximum"] == 4
 
 
+@gen_test()
+async def test_coalesce():
+    with dask.config.set(config):
+        async with DaskClusterManager() as manager:
+            model = await manager.start_cluster()
+            cluster = manager._clusters[model["id"]]
+            calls = []
+            scale = cluster.scale
+
+            async def slow_scale(n):
+                calls.append(n)
+                await sleep(0.1)
+                return scale(n)
+
+            cluster.scale = slow_scale
+
+            # Requests queued behind a running one collapse into the latest
+            models = await asyncio.gather(
+                manager.scale_cluster(model["id"], 4),
+                manager.adapt_cluster(model["id"], 0, 4),
+                manager.scale_cluster(model["id"], 3),
+                manager.scale_cluster(model["id"], 2),
+            )
+            assert calls == [4, 2]
+            assert models[0].get("adapt") is None
+            assert all(m == models[1] for m in models[1:])
+            assert models[1].get("adapt") is None
+            assert model["id"] not in manager._queued
+
+            # Scaling stops adaptive scaling
+            await manager.adapt_cluster(model["id"], 0, 4)
+            adaptive = manager._adaptives[model["id"]]
+            await manager.scale_cluster(model["id"], 1)
+            assert model["id"] not in manager._adaptives
+            assert adaptive.periodic_callback is None
+
+
+@gen_test()
+async def test_sync_factory():
+    sync_config = dask.config.merge(
+        config, {"labextension": {"factory": {"asynchronous": False}}}
+    )
+    with dask.config.set(sync_config):
+        async with DaskClusterManager() as manager:
+            model = await manager.start_cluster(configuration={"workers": 1})
+            cluster = manager._clusters[model["id"]]
+            assert not cluster.asynchronous
+
+            model = await manager.scale_cluster(model["id"], 2)
+            start = time()
+            while model["workers"] != 2:
+                await sleep(0.01)
+                model = await manager.get_cluster(model["id"], refresh=True)
+                assert time() < start + 10, model["workers"]
+
+            await manager.close_cluster(model["id"])
+            assert cluster.status.name == "closed"
+
+    # A cluster that starts after the executor timeout is closed.
+    FakeCluster.instances.clear()
+    slow = fake_cluster_config(asynchronous=False, delay=0.2)
+    slow["labextension"]["executor"]["timeout"] = 0.05
+    with dask.config.set(slow):
+        async with DaskClusterManager() as manager:
+            with pytest.raises(asyncio.TimeoutError):
+                await manager.start_cluster()
+            (cluster,) = FakeCluster.instances
+            start = time()
+            while cluster.status != "closed":
+                await sleep(0.05)
+                assert time() < start + 5
+
+
+class UnresponsiveCluster:
+    """A synchronous cluster whose scheduler doesn't answer."""
+
+    asynchronous = False
+    scheduler_address = "tcp://127.0.0.1:8786"
+    dashboard_link = ""
+
+    @property
+    def scheduler_info(self):
+        sleep_thread(0.5)
+        raise OSError("Timed out")
+
+
+@gen_test()
+async def test_list_stale():
+    with dask.config.set(
+        dask.config.merge(config, {"labextension": {"model-cache": {"timeout": 0.1}}})
+    ):
+        async with DaskClusterManager() as manager:
+            model = await manager.start_cluster()
+            manager._clusters["slow"] = UnresponsiveCluster()
+            manager._cluster_names["slow"] = "Slow"
+            try:
+                start = time()
+                models = await manager.list_clusters(refresh=True)
+                assert time() < start + 0.4
+                assert len(models) == 2
+                assert models[0]["id"] == model["id"]
+                assert not models[0]["stale"]
+                assert models[1]["id"] == "slow"
+                assert models[1]["stale"]
+                assert models[1]["status"] == "running"
+                assert "Timed out" in models[1]["error"]
+
+                # The periodic callbacks don't wait for it either, but
+                # rebuild its model in the thread pool in the background.
+                await sleep(0.6)
+                start = time()
+                manager._check_for_changes()
+                assert time() < start + 0.1
+                assert "slow" in manager._polling
+            finally:
+                del manager._clusters["slow"]
+                del manager._cluster_names["slow"]
+                await sleep(0.6)  # let the thread finish
+
+
+@gen_test()
+async def test_etag():
+    with dask.config.set(config):
+        async with DaskClusterManager() as manager:
+            empty = manager.etag()
+            model = await manager.start_cluster()
+            cluster_id = model["id"]
+            list_etag, cluster_etag = manager.etag(), manager.etag(cluster_id)
+            assert list_etag != empty
+            assert cluster_etag is not None
+
+            # Unchanged models keep their tags
+            await manager.list_clusters(refresh=True)
+            assert manager.etag() == list_etag
+            assert manager.etag(cluster_id) == cluster_etag
+
+            # Changes to a model change the tags
+            await manager.adapt_cluster(cluster_id, 0, 2)
+            assert manager.etag() != list_etag
+            assert manager.etag(cluster_id) != cluster_etag
+
+            list_etag = manager.etag()
+            await manager.close_cluster(cluster_id)
+            assert manager.etag() != list_etag
+            assert manager.etag(cluster_id) is None
+
+        # Tags are distinct across managers
+        async with DaskClusterManager() as other:
+            assert other.etag() != empty
+
+
+@pytest.mark.parametrize("asynchronous", [True, False])
+@gen_test()
+async def test_fake_cluster(asynchronous):
+    with dask.config.set(fake_cluster_config(asynchronous, n_workers=2)):
+        async with DaskClusterManager() as manager:
+            model = await manager.start_cluster()
+            assert model["workers"] == 2
+            assert model["cores"] == 4
+            model = await manager.scale_cluster(model["id"], 1000)
+            assert model["workers"] == 1000
+            model = await manager.adapt_cluster(model["id"], 1, 10)
+            assert model["workers"] == 1
+            assert model["adapt"] == {"minimum": 1, "maximum": 10}
+            await manager.close_cluster(model["id"])
+            assert not manager.models
+
+
 @gen_test()
 async def test_initial():
     with dask.config.set(
-        {
-            "labextension": {
-                "initial": [{"name": "foo"}],
-                "default": {},
-                "factory": {
-                    "module": "dask.distributed",
-                    "class": "LocalCluster",
-                    "kwargs": {"processes": False},
-                    "args": [],
-                },
-            }
-        }
+        dask.config.merge(config, {"labextension": {"initial": [{"name": "foo"}]}})
     ):
         # Test asynchronous starting of clusters via a context
         async with DaskClusterManager() as manager:
@@ -162,3 +328,415 @@ async def test_initial():
         assert len(clusters) == 1
         assert clusters[0]["name"] == "foo"
         await manager.close()
+
+    # A failing cluster doesn't prevent the others from starting
+    with dask.config.set(
+        dask.config.merge(
+            config,
+            {
+                "labextension": {
+                    "initial": [
+                        {"name": "foo"},
+                        {"name": "bar", "workers": "not a number"},
+                    ]
+                }
+            },
+        )
+    ):
+        async with DaskClusterManager() as manager:
+            clusters = await manager.list_clusters()
+            assert [c["name"] for c in clusters] == ["foo"]
+            log = {entry["name"]: entry for entry in manager.startup_log}
+            assert log["foo"]["id"] == clusters[0]["id"]
+            assert log["foo"]["error"] is None
+            assert log["bar"]["error"]
+            assert all(entry["duration"] > 0 for entry in log.values())
+
+    # A cluster that starts too late is closed once it has started.
+    FakeCluster.instances.clear()
+    slow = fake_cluster_config(delay=0.2)
+    slow["labextension"]["initial"] = [{"name": "slow"}]
+    slow["labextension"]["startup"]["timeout"] = 0.05
+    with dask.config.set(slow):
+        async with DaskClusterManager() as manager:
+            assert manager.startup_log[0]["error"] == "TimeoutError()"
+            assert not await manager.list_clusters()
+            (cluster,) = FakeCluster.instances
+            start = time()
+            while cluster.status != "closed":
+                await sleep(0.05)
+                assert time() < start + 5
+
+
+@gen_test()
+async def test_events():
+    with dask.config.set(config):
+        async with DaskClusterManager() as manager:
+            model = await manager.start_cluster()
+            events = []
+            snapshot = manager.subscribe(events.append)
+            assert snapshot == {"type": "snapshot", "clusters": [model]}
+
+            # adding, changing and removing clusters are pushed to subscribers
+            model2 = await manager.start_cluster()
+            assert events[-1] == {"type": "added", "cluster": model2}
+            model2 = await manager.adapt_cluster(model2["id"], 0, 4)
+            assert events[-1] == {"type": "updated", "cluster": model2}
+            await manager.close_cluster(model2["id"])
+            assert events[-1] == {"type": "removed", "id": model2["id"]}
+
+            # changes made outside of the manager are picked up by polling
+            manager._clusters[model["id"]].scale(2)
+            start = time()
+            while events[-1].get("cluster", {}).get("workers") != 2:
+                await sleep(0.05)
+                assert time() < start + 10
+
+            manager.unsubscribe(events.append)
+            n_events = len(events)
+            await manager.close_cluster(model["id"])
+            assert len(events) == n_events
+
+    # The resources in use by an idle cluster change, but that isn't
+    # pushed to subscribers, and doesn't change the (weak) ETag of its model.
+    with dask.config.set(config), dask.config.set(
+        {"labextension.events.interval": "50ms"}
+    ):
+        async with DaskClusterManager() as manager:
+            model = await manager.start_cluster(configuration={"workers": 2})
+            start = time()
+            while model["workers"] != 2:
+                await sleep(0.05)
+                assert time() < start + 10
+                model = await manager.get_cluster(model["id"], refresh=True)
+            etag = manager.etag(model["id"])
+            assert etag.startswith('W/"')
+            events = []
+            manager.subscribe(events.append)
+            for _ in range(10):
+                await sleep(0.1)
+                model = await manager.get_cluster(model["id"], refresh=True)
+            manager._update_model(dict(model, cpu=model["cpu"] + 100))
+            assert (await manager.get_cluster(model["id"]))["cpu"] >= 100
+            assert events == []
+            assert manager.etag(model["id"]) == etag
+
+
+@gen_test()
+async def test_model_cache():
+    with dask.config.set(config):
+        with dask.config.set({"labextension.model-cache.ttl": "1 hour"}):
+            async with DaskClusterManager() as manager:
+                model = await manager.start_cluster()
+                manager._clusters[model["id"]].scale(2)
+                await sleep(0.5)
+
+                # the cached model is served until it is refreshed
+                assert await manager.get_cluster(model["id"]) == model
+                assert await manager.list_clusters() == [model]
+                start = time()
+                while model["workers"] != 2:
+                    await sleep(0.05)
+                    model = await manager.get_cluster(model["id"], refresh=True)
+                    assert time() < start + 10
+                assert await manager.list_clusters() == [model]
+
+
+@gen_test()
+async def test_dashboard_route():
+    with dask.config.set(config):
+        async with DaskClusterManager() as manager:
+            model = await manager.start_cluster()
+            host, port = manager.get_dashboard_route(model["id"])
+            assert f"{host}:{port}" in model["dashboard_link"]
+
+            # routes are forgotten when the cluster is closed
+            await manager.close_cluster(model["id"])
+            with pytest.raises(KeyError):
+                manager.get_dashboard_route(model["id"])
+
+
+@gen_test()
+async def test_warm_pool():
+    with dask.config.set(config):
+        with dask.config.set({"labextension.warm-pool.size": 1}):
+            async with DaskClusterManager() as manager:
+                start = time()
+                while manager.pool_size != 1:
+                    await sleep(0.01)
+                    assert time() < start + 10
+
+                # new clusters are handed out from the pool, which is refilled
+                model = await manager.start_cluster()
+                assert manager.pool_size == 0
+                assert [model] == await manager.list_clusters()
+                start = time()
+                while manager.pool_size != 1:
+                    await sleep(0.01)
+                    assert time() < start + 10
+
+                # clusters with a custom configuration aren't taken from the pool
+                await manager.start_cluster(configuration={"workers": 1})
+                assert manager.pool_size == 1
+
+                # idle pooled clusters are closed, and not replaced
+                with dask.config.set({"labextension.warm-pool.max-idle": 0}):
+                    manager._check_pool()
+                assert manager.pool_size == 0
+                assert manager._pool_filling is None
+
+        # the pool doesn't grow past its memory limit
+        with dask.config.set(
+            {
+                "labextension.warm-pool.size": 1,
+                "labextension.warm-pool.memory-limit": "1 B",
+            }
+        ):
+            async with DaskClusterManager() as manager:
+                start = time()
+                while manager._pool_cluster_memory is None:
+                    await sleep(0.01)
+                    assert time() < start + 10
+                assert manager.pool_size == 0
+                # having learned how big a cluster is, it doesn't try again
+                manager._check_pool()
+                assert manager._pool_filling is not None
+                await manager._pool_filling
+                assert manager.pool_size == 0
+
+
+@gen_test()
+async def test_create():
+    with dask.config.set(config):
+        async with DaskClusterManager() as manager:
+            # clusters are started in the background
+            model = await manager.create_cluster()
+            assert model["status"] == "starting"
+            assert await manager.list_clusters() == [model]
+            name = model["name"]
+            assert name == "LocalCluster 1"
+            start = time()
+            while model["status"] == "starting":
+                await sleep(0.01)
+                model = await manager.get_cluster(model["id"])
+                assert time() < start + 10
+            assert model["status"] == "running"
+            assert model["scheduler_address"]
+            assert model["name"] == name
+
+            # failures are reported in the model until the cluster is closed
+            model = await manager.create_cluster(configuration={"workers": "many"})
+            while model["status"] == "starting":
+                await sleep(0.01)
+                model = await manager.get_cluster(model["id"])
+            assert model["status"] == "failed"
+            assert model["error"]
+            assert len(await manager.list_clusters()) == 2
+            await manager.close_cluster(model["id"])
+            assert len(await manager.list_clusters()) == 1
+
+            # clusters closed while starting are closed once they start
+            model = await manager.create_cluster()
+            model = await manager.close_cluster(model["id"])
+            assert model["status"] == "closing"
+            start = time()
+            while await manager.get_cluster(model["id"]):
+                await sleep(0.01)
+                assert time() < start + 10
+            assert len(await manager.list_clusters()) == 1
+
+
+@gen_test()
+async def test_close_all():
+    with dask.config.set(config):
+        with dask.config.set({"labextension.shutdown.timeout": "1s"}):
+            manager = await DaskClusterManager()
+            model1 = await manager.start_cluster()
+            model2 = await manager.start_cluster()
+            cluster = manager._clusters[model2["id"]]
+            close = cluster.close
+
+            async def hang():
+                await close()
+                await sleep(3600)
+
+            # a cluster that hangs while closing is reported and forced closed
+            cluster.close = hang
+            start = time()
+            failures = await manager.close()
+            assert time() < start + 5
+            assert list(failures) == [model2["id"]]
+            assert "timed out" in failures[model2["id"]]
+            assert not await manager.list_clusters()
+            assert not await manager.get_cluster(model1["id"])
+
+
+@gen_test()
+async def test_idle_reaper():
+    from distributed import Client
+
+    idle = {
+        "scale-down-after": "200ms",
+        "close-after": "1s",
+        "minimum": 0,
+        "interval": "50ms",
+    }
+    with dask.config.set(config), dask.config.set({"labextension.idle": idle}):
+        async with DaskClusterManager() as manager:
+            busy = await manager.start_cluster(configuration={"workers": 1})
+            cluster = manager._clusters[busy["id"]]
+            async with Client(cluster, asynchronous=True):
+                unused = await manager.start_cluster(configuration={"workers": 1})
+
+                # The unused cluster is scaled down, then closed.
+                start = time()
+                while (await manager.get_cluster(unused["id"], refresh=True))[
+                    "workers"
+                ]:
+                    await sleep(0.05)
+                    assert time() < start + 5
+                model = await manager.get_cluster(unused["id"])
+                assert model["reap_reason"].startswith("Scaled down to 0 workers")
+                while await manager.get_cluster(unused["id"]):
+                    await sleep(0.05)
+                    assert time() < start + 10
+
+                # The cluster with a client connected is left alone.
+                model = await manager.get_cluster(busy["id"], refresh=True)
+                assert model["workers"] == 1
+                assert model["idle_time"] == 0
+                assert model["reap_reason"] is None
+
+    # An idle adaptive cluster has its minimum lowered, and stays adaptive.
+    idle["close-after"] = None
+    with dask.config.set(config), dask.config.set({"labextension.idle": idle}):
+        async with DaskClusterManager() as manager:
+            model = await manager.start_cluster(
+                configuration={"adapt": {"minimum": 1, "maximum": 3}}
+            )
+            start = time()
+            while model["adapt"]["minimum"]:
+                await sleep(0.05)
+                assert time() < start + 5
+                model = await manager.get_cluster(model["id"], refresh=True)
+            assert model["adapt"] == {"minimum": 0, "maximum": 3}
+            assert model["reap_reason"].startswith("Adaptive minimum lowered to 0")
+
+            # The idle time counting up isn't pushed, and doesn't change the ETag.
+            while model["workers"]:
+                await sleep(0.1)
+                assert time() < start + 10
+                model = await manager.get_cluster(model["id"], refresh=True)
+            etag = manager.etag(model["id"])
+            events = []
+            manager.subscribe(events.append)
+            idle_time = model["idle_time"]
+            start = time()
+            while model["idle_time"] < idle_time + 2:
+                await sleep(0.1)
+                assert time() < start + 5
+                model = await manager.get_cluster(model["id"])
+            assert manager.etag(model["id"]) == etag
+            assert events == []
+
+
+@gen_test()
+async def test_budget():
+    from dask_labextension.manager import BudgetExceeded
+
+    budget = {"workers": 6, "threads": None, "memory": None, "policy": "clamp"}
+    with dask.config.set(fake_cluster_config(n_workers=4)), dask.config.set(
+        {"labextension.budget": budget}
+    ):
+        async with DaskClusterManager() as manager:
+            a = await manager.start_cluster()
+            assert a["workers"] == 4
+            # Clamped to the workers left.
+            b = await manager.start_cluster()
+            assert b["workers"] == 2
+            assert manager.headroom() == {"workers": 0, "threads": None, "memory": None}
+            a = await manager.scale_cluster(a["id"], 10)
+            assert a["workers"] == 4
+            await manager.scale_cluster(b["id"], 1)
+            assert manager.headroom()["workers"] == 1
+
+            # Workers have 1 GiB each, so 3.5 GiB is left for cluster a.
+            with dask.config.set({"labextension.budget.memory": "4.5 GiB"}):
+                a = await manager.scale_cluster(a["id"], 10)
+                assert a["workers"] == 3
+                b = await manager.adapt_cluster(b["id"], 2, 10)
+                assert b["adapt"] == {"minimum": 1, "maximum": 1}
+
+            with dask.config.set({"labextension.budget.policy": "reject"}):
+                with pytest.raises(BudgetExceeded, match="only room for 3"):
+                    await manager.scale_cluster(b["id"], 4)
+                # The new cluster would have 4 workers.
+                with pytest.raises(BudgetExceeded, match="'FakeCluster 3'"):
+                    await manager.start_cluster()
+                assert len(await manager.list_clusters()) == 2
+                await manager.scale_cluster(b["id"], 3)
+                assert manager.headroom()["workers"] == 0
+
+    # The factory is never asked for more workers than fit, even when
+    # clusters are started concurrently.
+    FakeCluster.instances.clear()
+    with dask.config.set(fake_cluster_config(n_workers=4)), dask.config.set(
+        {"labextension.budget": budget}
+    ):
+        async with DaskClusterManager() as manager:
+            models = await asyncio.gather(*[manager.start_cluster() for _ in range(3)])
+            assert [c.n_workers for c in FakeCluster.instances] == [4, 2, 0]
+            assert [m["workers"] for m in models] == [4, 2, 0]
+
+            await manager.close_cluster(models[2]["id"])
+            with dask.config.set({"labextension.budget.policy": "reject"}):
+                with pytest.raises(BudgetExceeded):
+                    await manager.start_cluster()
+                # The cluster is rejected before it is started.
+                assert len(FakeCluster.instances) == 3
+                assert manager.headroom()["workers"] == 0
+
+                # One started in the background fails, naming the cluster.
+                model = await manager.create_cluster(configuration={"name": "big"})
+                while model["status"] == "starting":
+                    await asyncio.sleep(0.01)
+                    model = await manager.get_cluster(model["id"])
+                assert model["status"] == "failed"
+                assert model["error"].startswith("Dask cluster 'big' can't have")
+
+
+@gen_test()
+async def test_worker_usage():
+    from distributed import Client, Event
+
+    with dask.config.set(fake_cluster_config(n_workers=2)):
+        async with DaskClusterManager() as manager:
+            model = await manager.start_cluster()
+            assert model["memory_managed"] == model["tasks_processing"] == 0
+            cluster = manager._clusters[model["id"]]
+            cluster.load(managed=100, unmanaged=50, spilled=10, processing=3, cpu=50.0)
+            model = await manager.get_cluster(model["id"], refresh=True)
+            assert model["memory_managed"] == 200
+            assert model["memory_unmanaged"] == 100
+            assert model["memory_spilled"] == 20
+            assert model["tasks_processing"] == 6
+            assert model["tasks_queued"] is None
+            assert model["cpu"] == 100.0
+
+    # The state of an in-process scheduler is read directly.
+    with dask.config.set(config):
+        async with DaskClusterManager() as manager:
+            model = await manager.start_cluster(configuration={"workers": 1})
+            cluster = manager._clusters[model["id"]]
+            async with Client(cluster, asynchronous=True) as client:
+                event = Event()
+                futures = client.map(lambda i: event.wait(), range(10), pure=False)
+                start = time()
+                while not model["tasks_processing"]:
+                    await sleep(0.05)
+                    assert time() < start + 5
+                    model = await manager.get_cluster(model["id"], refresh=True)
+                assert model["tasks_processing"] + model["tasks_queued"] == 10
+                assert model["memory_unmanaged"] > 0
+                await event.set()
+                await client.gather(futures)
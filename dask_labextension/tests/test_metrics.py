@@ -0,0 +1,58 @@
+import dask
+from distributed.utils_test import gen_test
+
+from dask_labextension.manager import DaskClusterManager
+from dask_labextension.metrics import generate_metrics
+
+from .test_manager import config
+from .utils import fake_cluster_config, serve_dashboard, serve_jupyter
+
+
+@gen_test()
+async def test_metrics():
+    with dask.config.set(config):
+        async with DaskClusterManager() as manager:
+            model = await manager.start_cluster(configuration={"workers": 1})
+            await manager.get_cluster(model["id"])
+            await manager.scale_cluster(model["id"], 2)
+
+            text = generate_metrics(manager).decode()
+            assert (
+                'dask_labextension_operation_seconds_count{operation="start"}' in text
+            )
+            assert (
+                'dask_labextension_operation_seconds_count{operation="scale"}' in text
+            )
+            assert (
+                'dask_labextension_cache_requests_total{cache="model",result="hit"}'
+                in text
+            )
+            assert 'dask_labextension_clusters{status="running"} 1.0' in text
+            labels = f'cluster="{model["id"]}",name="{model["name"]}"'
+            assert f"dask_labextension_cluster_workers{{{labels}}}" in text
+            assert manager.models[0]["memory_limit"] > 0
+            assert f"dask_labextension_cluster_memory_bytes{{{labels}}}" in text
+
+
+@gen_test(timeout=60)
+async def test_proxy_metrics():
+    async with serve_dashboard() as dashboard:
+        config = fake_cluster_config(dashboard_link=f"{dashboard}/status")
+        async with serve_jupyter(config) as server:
+            manager = await server.manager
+            model = await manager.start_cluster()
+            response = await server.fetch(
+                f"dask/dashboard/{model['id']}/individual-plots.json"
+            )
+            assert response.code == 200
+            response = await server.fetch("dask/dashboard/missing/status")
+            assert response.code == 404
+
+            text = (await server.fetch("dask/metrics")).body.decode()
+            assert f'proxy_seconds_count{{cluster="{model["id"]}"}}' in text
+            # Requests for unknown clusters aren't recorded.
+            assert "missing" not in text
+
+            await manager.close_cluster(model["id"])
+            text = (await server.fetch("dask/metrics")).body.decode()
+            assert model["id"] not in text
@@ -0,0 +1,98 @@
+import os
+
+import dask
+from distributed.utils_test import gen_test
+
+from dask_labextension import sizing
+from dask_labextension.manager import DaskClusterManager
+from dask_labextension.sizing import (
+    auto_sizing,
+    estimate_workers,
+    numa_nodes,
+    parse_cpulist,
+    sizing_kwargs,
+)
+
+from .utils import fake_cluster_config
+
+
+def test_parse_cpulist():
+    assert parse_cpulist("0-3,8,10-11\n") == [0, 1, 2, 3, 8, 10, 11]
+    assert parse_cpulist("") == []
+
+
+def test_numa_nodes(tmp_path, monkeypatch):
+    monkeypatch.setattr(sizing, "_allowed_cpus", lambda: [0, 1, 2, 3, 4, 5])
+    for i, cpus in enumerate(["0-3", "4-7", ""]):
+        os.mkdir(tmp_path / f"node{i}")
+        (tmp_path / f"node{i}" / "cpulist").write_text(cpus)
+    os.mkdir(tmp_path / "power")
+    # Only the CPUs the process may run on are included, and empty nodes aren't.
+    assert numa_nodes(str(tmp_path)) == [[0, 1, 2, 3], [4, 5]]
+    assert numa_nodes(str(tmp_path / "missing")) == [[0, 1, 2, 3, 4, 5]]
+
+
+def test_auto_sizing():
+    nodes = [list(range(64)), list(range(64, 128))]
+    s = auto_sizing(cpus=128, memory=2**40, nodes=nodes)
+    assert (s["workers"], s["threads_per_worker"]) == (16, 8)
+    assert s["memory_limit"] == 2**40 // 16
+    assert s["numa_nodes"] == 2
+
+    s = auto_sizing(cpus=8, memory=2**33, nodes=[list(range(8))])
+    assert (s["workers"], s["threads_per_worker"]) == (4, 2)
+
+    # A CPU quota smaller than the number of nodes.
+    s = auto_sizing(cpus=1, memory=2**30, nodes=nodes)
+    assert (s["workers"], s["threads_per_worker"], s["numa_nodes"]) == (1, 1, 1)
+
+
+def test_sizing_kwargs():
+    s = auto_sizing(cpus=16, memory=2**34, nodes=[[0], [1]])
+    kwargs = sizing_kwargs(s)
+    assert kwargs == {"n_workers": 8, "threads_per_worker": 2, "memory_limit": 2**31}
+    assert sizing_kwargs(s, pin=True)["preload"] == ["dask_labextension.sizing"]
+    s = auto_sizing(cpus=16, memory=2**34, nodes=[[0]])
+    assert "preload" not in sizing_kwargs(s, pin=True)
+
+
+@gen_test()
+async def test_auto_sized_cluster():
+    config = fake_cluster_config()
+    with dask.config.set(config), dask.config.set({"labextension.sizing.mode": "auto"}):
+        async with DaskClusterManager() as manager:
+            model = await manager.start_cluster()
+            expected = auto_sizing()
+            assert model["sizing"]["workers"] == expected["workers"]
+            assert model["workers"] == expected["workers"]
+            assert (
+                model["cores"] == expected["workers"] * expected["threads_per_worker"]
+            )
+            assert not model["sizing"]["pinned"]
+
+        # Explicit factory kwargs take precedence.
+        with dask.config.set({"labextension.factory.kwargs": {"n_workers": 3}}):
+            async with DaskClusterManager() as manager:
+                model = await manager.start_cluster()
+                assert model["workers"] == model["sizing"]["workers"] == 3
+
+    with dask.config.set(config):
+        async with DaskClusterManager() as manager:
+            model = await manager.start_cluster()
+            assert model["sizing"] is None
+
+
+def test_estimate_workers(monkeypatch):
+    monkeypatch.setattr(sizing, "cpu_count", lambda: 8)
+    monkeypatch.setattr(sizing, "memory_limit", lambda: 16 * 2**30)
+    # As LocalCluster chooses them.
+    assert estimate_workers({}) == (4, 2, 4 * 2**30)
+    assert estimate_workers({"n_workers": 2}) == (2, 4, 8 * 2**30)
+    assert estimate_workers({"threads_per_worker": 4, "memory_limit": "1 GiB"}) == (
+        2,
+        4,
+        2**30,
+    )
+    assert estimate_workers({"processes": False}) == (1, 8, 16 * 2**30)
+    # Only what is given is known for other clusters.
+    assert estimate_workers({"n_workers": 3}, local=False) == (3, 0, 0)
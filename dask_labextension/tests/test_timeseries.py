@@ -0,0 +1,87 @@
+import json
+import math
+
+from distributed.metrics import time
+from distributed.utils_test import gen_test
+from tornado.gen import sleep
+
+from dask_labextension.timeseries import RingBuffer, to_json
+
+from .utils import fake_cluster_config, serve_jupyter
+
+
+def test_ring_buffer():
+    buffer = RingBuffer(["x", "y"], 3)
+    assert len(buffer) == 0
+    assert to_json(buffer.since()[1]) == {"x": [], "y": []}
+
+    buffer.append({"x": 1, "y": None})
+    buffer.append({"x": 2, "y": 20})
+    cursor, columns = buffer.since()
+    assert cursor == 2
+    assert list(columns["x"]) == [1, 2]
+    assert math.isnan(columns["y"][0])
+    assert to_json(columns)["y"] == [None, 20]
+
+    # Samples are overwritten oldest first.
+    for x in [3, 4, 5]:
+        buffer.append({"x": x, "y": x * 10})
+    assert len(buffer) == 3
+    assert list(buffer.since()[1]["x"]) == [3, 4, 5]
+    assert list(buffer.since(4)[1]["x"]) == [5]
+    assert list(buffer.since(1)[1]["x"]) == [3, 4, 5]
+    cursor, columns = buffer.since(5)
+    assert cursor == 5 and to_json(columns) == {"x": [], "y": []}
+    # A cursor from a previous server gets everything.
+    assert list(buffer.since(100)[1]["x"]) == [3, 4, 5]
+
+
+@gen_test(timeout=60)
+async def test_timeseries_handler():
+    config = fake_cluster_config(n_workers=2)
+    config["labextension"]["timeseries"].update(
+        interval="10ms", length=5, **{"idle-after": "300ms"}
+    )
+    async with serve_jupyter(config) as server:
+        manager = await server.manager
+        model = await manager.start_cluster()
+        manager._clusters[model["id"]].load(managed=100, unmanaged=50, cpu=10.0)
+        await manager.get_cluster(model["id"], refresh=True)
+        path = f"dask/clusters/{model['id']}/timeseries"
+        # Clusters are only sampled once their time series are asked for.
+        await sleep(0.1)
+        assert manager._sampler is None
+        response = await server.fetch(path)
+        assert response.code == 200
+        assert len(json.loads(response.body)["columns"]["time"]) == 1
+        await sleep(0.2)
+
+        response = await server.fetch(path)
+        assert response.code == 200
+        body = json.loads(response.body)
+        assert body["cursor"] > 5
+        columns = body["columns"]
+        assert len(columns["time"]) == 5
+        assert columns["workers"][-1] == 2
+        assert columns["memory"][-1] == 300
+        assert columns["cpu"][-1] == 20.0
+        assert columns["tasks_queued"][-1] is None
+
+        await sleep(0.1)
+        response = await server.fetch(f"{path}?since={body['cursor']}")
+        body = json.loads(response.body)
+        assert 0 < len(body["columns"]["time"]) <= 5
+
+        response = await server.fetch(f"{path}?since=x")
+        assert response.code == 400
+        response = await server.fetch("dask/clusters/missing/timeseries")
+        assert response.code == 404
+
+        # Sampling stops once no one asks for the time series.
+        start = time()
+        while manager._sampler is not None:
+            await sleep(0.05)
+            assert time() < start + 5
+
+        await manager.close_cluster(model["id"])
+        assert not manager._timeseries
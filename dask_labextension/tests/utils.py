@@ -0,0 +1,313 @@
+"""
+Helpers for exercising the extension without real Dask clusters: a fake
+cluster class, a stand-in for a Bokeh dashboard server, and a Jupyter
+server running the extension in this process. These are used by the
+tests, the benchmarks and the load test.
+"""
+
+import asyncio
+import itertools
+import json
+import math
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List
+
+import dask
+from tornado import httpclient, web, websocket
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+from dask_labextension import setup_settings
+from dask_labextension.config import defaults
+
+_ports = itertools.count(20000)
+
+
+class FakeAdaptive:
+    """The adaptive scaling of a `FakeCluster`, which doesn't do anything."""
+
+    def __init__(self, minimum: int = 0, maximum: float = math.inf) -> None:
+        self.minimum = minimum
+        self.maximum = maximum
+        self.stopped = False
+
+    def stop(self) -> None:
+        self.stopped = True
+
+
+class FakeCluster:
+    """
+    A stand-in for a Dask cluster class, for use as the
+    ``labextension.factory``, which reports synthetic workers
+    in its scheduler info without running any.
+
+    Parameters
+    ----------
+    n_workers: int
+        The number of workers to start with.
+
+    threads_per_worker: int
+        The number of threads reported for each worker.
+
+    memory_limit: int
+        The memory limit reported for each worker, in bytes.
+
+    dashboard_link: string
+        The dashboard link of the cluster, e.g. a `serve_dashboard` URL.
+
+    delay: float
+        How long starting, scaling and closing the cluster take, in seconds.
+
+    asynchronous: bool
+        Whether the methods of the cluster return awaitables, or block.
+    """
+
+    # Every fake cluster created, to check that none are left unclosed.
+    instances: List["FakeCluster"] = []
+
+    def __init__(
+        self,
+        n_workers: int = 0,
+        threads_per_worker: int = 2,
+        memory_limit: int = 2**30,
+        dashboard_link: str = "",
+        delay: float = 0.0,
+        asynchronous: bool = False,
+    ) -> None:
+        # The number of workers the cluster was asked to start with.
+        self.n_workers = n_workers
+        self.threads_per_worker = threads_per_worker
+        self.memory_limit = memory_limit
+        self.dashboard_link = dashboard_link
+        self.delay = delay
+        self.asynchronous = asynchronous
+        self.scheduler_address = f"tcp://127.0.0.1:{next(_ports)}"
+        self.scheduler_info: Dict[str, Any] = {
+            "type": "Scheduler",
+            "address": self.scheduler_address,
+            "workers": {},
+        }
+        self.status = "created"
+        self.adaptive = None
+        self._set_workers(n_workers)
+        FakeCluster.instances.append(self)
+        if not asynchronous:
+            self._wait()
+            self.status = "running"
+
+    def __await__(self):
+        async def start():
+            await self._wait()
+            self.status = "running"
+            return self
+
+        return start().__await__()
+
+    def _wait(self):
+        # Take `delay` seconds, blocking or not.
+        if self.asynchronous:
+            return asyncio.sleep(self.delay)
+        time.sleep(self.delay)
+
+    def _set_workers(self, n: int) -> None:
+        workers = self.scheduler_info["workers"]
+        for address in list(workers)[n:]:
+            del workers[address]
+        for i in range(len(workers), n):
+            address = f"{self.scheduler_address}/worker-{i}"
+            workers[address] = {
+                "type": "Worker",
+                "id": i,
+                "host": "127.0.0.1",
+                "nthreads": self.threads_per_worker,
+                "memory_limit": self.memory_limit,
+                "metrics": self._metrics(),
+            }
+
+    def _metrics(self, managed=0, unmanaged=0, spilled=0, processing=0, cpu=0.0):
+        return {
+            "managed_bytes": managed,
+            "memory": managed + unmanaged,
+            "spilled_bytes": {"memory": 0, "disk": spilled},
+            "task_counts": {"executing": processing},
+            "cpu": cpu,
+        }
+
+    def load(self, **kwargs) -> None:
+        """
+        Set the metrics reported for every worker: the ``managed``,
+        ``unmanaged`` and ``spilled`` bytes, the tasks ``processing``,
+        and the ``cpu`` percentage.
+        """
+        for d in self.scheduler_info["workers"].values():
+            d["metrics"] = self._metrics(**kwargs)
+
+    def scale(self, n: int):
+        self._set_workers(n)
+        return self._wait()
+
+    def adapt(self, minimum: int = 0, maximum: float = math.inf, **kwargs):
+        if self.adaptive is not None:
+            self.adaptive.stop()
+        self.adaptive = FakeAdaptive(minimum, maximum)
+        self._set_workers(minimum)
+        return self.adaptive
+
+    def close(self):
+        self.status = "closed"
+        self._set_workers(0)
+        return self._wait()
+
+
+def fake_cluster_config(asynchronous: bool = True, **kwargs) -> dict:
+    """
+    The ``labextension`` configuration making the manager start
+    `FakeCluster` objects, created with the given keyword arguments.
+    """
+    return dask.config.merge(
+        defaults,
+        {
+            "labextension": {
+                "initial": [],
+                "default": {},
+                "factory": {
+                    "module": "dask_labextension.tests.utils",
+                    "class": "FakeCluster",
+                    "args": [],
+                    "kwargs": kwargs,
+                    "asynchronous": asynchronous,
+                },
+            }
+        },
+    )
+
+
+class _PlotsHandler(web.RequestHandler):
+    def get(self):
+        self.write({"Task Stream": "/individual-task-stream"})
+
+
+class _AssetHandler(web.RequestHandler):
+    def initialize(self, body):
+        self.body = body
+
+    def get(self, path):
+        self.set_header("Content-Type", "application/javascript")
+        self.write(self.body)
+
+
+class _DocumentHandler(web.RequestHandler):
+    def initialize(self, size):
+        self.size = size
+
+    def get(self):
+        # Repetitive JSON, like the columns of a Bokeh document.
+        n = self.size // 24
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps({"data": {"x": [1.5] * n, "y": [2.25] * n}}))
+
+
+class _PatchesHandler(websocket.WebSocketHandler):
+    """Sends ``?messages=`` JSON patches of ``?size=`` bytes, then closes."""
+
+    def get_compression_options(self):
+        return {}
+
+    async def open(self):
+        messages = int(self.get_query_argument("messages", "10"))
+        n = int(self.get_query_argument("size", "10000")) // 24
+        patch = json.dumps({"events": [{"x": [1.5] * n, "y": [2.25] * n}]})
+        for _ in range(messages):
+            await self.write_message(patch)
+        self.close()
+
+
+@asynccontextmanager
+async def serve_dashboard(
+    asset_size: int = 2**21, document_size: int = 2**20
+) -> AsyncIterator[str]:
+    """
+    Serve a stand-in for a Bokeh dashboard on a free local port,
+    yielding its URL. It serves:
+
+    - ``individual-plots.json``, so that dashboard checks find it
+    - static assets of ``asset_size`` bytes under ``statics/``
+    - a JSON document of about ``document_size`` bytes at ``document.json``
+    - a websocket at ``ws`` sending JSON patches
+    """
+    # Something about as compressible as minified JavaScript.
+    lines = (b"function f%d(a,b){return a*%d+b}\n" % (i, i) for i in itertools.count())
+    asset = b"".join(itertools.islice(lines, asset_size // 30 + 1))[:asset_size]
+    app = web.Application(
+        [
+            (r"/individual-plots.json", _PlotsHandler),
+            (r"/statics/(.*)", _AssetHandler, {"body": asset}),
+            (r"/document.json", _DocumentHandler, {"size": document_size}),
+            (r"/ws", _PatchesHandler),
+        ]
+    )
+    sockets = bind_sockets(0, "127.0.0.1")
+    server = HTTPServer(app)
+    server.add_sockets(sockets)
+    try:
+        yield f"http://127.0.0.1:{sockets[0].getsockname()[1]}"
+    finally:
+        server.stop()
+        await server.close_all_connections()
+
+
+class JupyterServer:
+    """A Jupyter server running the extension, as yielded by `serve_jupyter`."""
+
+    def __init__(self, app, token: str) -> None:
+        self.app = app
+        self.url = f"http://127.0.0.1:{app.port}{app.base_url}"
+        self.headers = {"Authorization": f"token {token}"}
+        self.client = httpclient.AsyncHTTPClient(force_instance=True, max_clients=100)
+
+    @property
+    def manager(self):
+        # The extension sets up its settings on the first request for it.
+        setup_settings(self.app.web_app.settings)
+        return self.app.web_app.settings["dask_cluster_manager"]
+
+    async def fetch(self, path: str, **kwargs) -> httpclient.HTTPResponse:
+        """Make an authenticated request to a path of the server."""
+        headers = dict(self.headers, **kwargs.pop("headers", {}))
+        return await self.client.fetch(
+            self.url + path, headers=headers, raise_error=False, **kwargs
+        )
+
+
+@asynccontextmanager
+async def serve_jupyter(
+    config: dict, token: str = "secret"
+) -> AsyncIterator[JupyterServer]:
+    """
+    Run a Jupyter server with the extension on a free local port in this
+    process, with the given dask configuration, for as long as the context.
+    """
+    from jupyter_server.serverapp import ServerApp
+
+    with dask.config.set(config), tempfile.TemporaryDirectory() as root:
+        app = ServerApp()
+        app.initialize(
+            argv=[
+                "--ServerApp.port=0",
+                "--ServerApp.open_browser=False",
+                "--ServerApp.allow_root=True",
+                "--ServerApp.log_level=WARN",
+                f"--ServerApp.root_dir={root}",
+                f"--IdentityProvider.token={token}",
+                "--ServerApp.jpserver_extensions={'dask_labextension': True}",
+            ]
+        )
+        server = JupyterServer(app, token)
+        try:
+            yield server
+        finally:
+            server.client.close()
+            await (await server.manager).close()
+            await app._cleanup()
@@ -0,0 +1,98 @@
+"""Fixed-size time series of the state of clusters, for sparklines."""
+
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import math
+from array import array
+from typing import Dict, List, Sequence, Tuple, Union
+
+# The columns sampled from the model of each cluster: the (unix) time,
+# the workers and cores, the memory in use in bytes (in all, and managed,
+# unmanaged and spilled), the tasks processing and queued, and the CPU
+# use of the workers in percent.
+COLUMNS = (
+    "time",
+    "workers",
+    "cores",
+    "memory",
+    "memory_managed",
+    "memory_unmanaged",
+    "memory_spilled",
+    "tasks_processing",
+    "tasks_queued",
+    "cpu",
+)
+
+
+class RingBuffer:
+    """
+    The most recent samples of some columns of numbers, up to a fixed
+    number, with each column held in a preallocated array of doubles.
+    Missing values are stored as NaN.
+
+    Samples are numbered from zero as they are appended, so that a reader
+    can ask for those that came after the last one it saw.
+
+    Parameters
+    ----------
+    columns: sequence of strings
+        The names of the columns.
+
+    capacity: int
+        The number of samples to keep.
+    """
+
+    def __init__(self, columns: Sequence[str], capacity: int) -> None:
+        self.columns = tuple(columns)
+        self.capacity = capacity
+        self.count = 0
+        self._arrays = {c: array("d", bytes(8 * capacity)) for c in self.columns}
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def append(self, values: Dict[str, Union[float, None]]) -> None:
+        """Add a sample, overwriting the oldest one if the buffer is full."""
+        i = self.count % self.capacity
+        for column, values_array in self._arrays.items():
+            value = values.get(column)
+            values_array[i] = math.nan if value is None else value
+        self.count += 1
+
+    def since(self, cursor: int = 0) -> Tuple[int, Dict[str, array]]:
+        """
+        Get the samples from number ``cursor`` on, or from the oldest sample
+        kept if that was overwritten, by column.
+
+        Parameters
+        ----------
+        cursor: int
+            The number of the first sample to get. A cursor past the last
+            sample (e.g. from before the server restarted) gets all of them.
+
+        Returns
+        cursor, columns : the number of the next sample, to pass as the cursor
+            of the next call, and an array of the samples of each column.
+        """
+        if cursor > self.count:
+            cursor = 0
+        start = max(cursor, self.count - self.capacity)
+        i, j = start % self.capacity, self.count % self.capacity
+        columns = {}
+        for column, values_array in self._arrays.items():
+            if start == self.count:
+                columns[column] = array("d")
+            elif i < j:
+                columns[column] = values_array[i:j]
+            else:
+                columns[column] = values_array[i:] + values_array[:j]
+        return self.count, columns
+
+
+def to_json(columns: Dict[str, array]) -> Dict[str, List[Union[float, None]]]:
+    """Convert columns of samples to lists, with None for missing values."""
+    return {
+        column: [None if math.isnan(x) else x for x in values]
+        for column, values in columns.items()
+    }
@@ -40,6 +40,13 @@ import { CommandRegistry } from '@lumino/commands';
  */
 const REFRESH_INTERVAL = 5000;
 
+/**
+ * An interval (in ms) for fetching new samples of the load of running
+ * clusters, and the number of samples shown in their sparklines.
+ */
+const TIMESERIES_INTERVAL = 5000;
+const TIMESERIES_LENGTH = 150;
+
 /**
  * The threshold in pixels to start a drag event.
  */
@@ -68,9 +75,12 @@ export class DaskClusterManager extends Widget {
     this._registry = options.registry;
     this._launchClusterId = options.launchClusterId;
 
-    // A function to set the active cluster.
+    // A function to set the active cluster. Only a running cluster
+    // has a scheduler for clients to connect to, so only it can be active.
     this._setActiveById = (id: string) => {
-      const cluster = this._clusters.find(c => c.id === id);
+      const cluster = this._clusters.find(
+        c => c.id === id && c.status === 'running'
+      );
       if (!cluster) {
         return;
       }
@@ -88,10 +98,10 @@ export class DaskClusterManager extends Widget {
       }
 
       const old = this._activeCluster;
+      this._activeCluster = cluster;
       if (old && old.id === cluster.id) {
         return;
       }
-      this._activeCluster = cluster;
       this._activeClusterChanged.emit({
         name: 'cluster',
         oldValue: old,
@@ -140,14 +150,29 @@ export class DaskClusterManager extends Widget {
 
     // Do an initial refresh of the cluster list.
     void this._updateClusterList();
-    // Also refresh periodically.
+    // Also refresh periodically, until the server starts pushing changes.
     this._poll = new Poll({
       factory: async () => {
         await this._updateClusterList();
+        // If the event stream was dropped, try to reconnect.
+        if (this._eventsSupported && !this._events) {
+          this._connectEvents();
+        }
       },
       frequency: { interval: REFRESH_INTERVAL, backoff: true, max: 60 * 1000 },
       standby: 'when-hidden'
     });
+    this._connectEvents();
+    // Fetch the load of running clusters for their sparklines.
+    this._timeseriesPoll = new Poll({
+      factory: () => this._updateTimeseries(),
+      frequency: {
+        interval: TIMESERIES_INTERVAL,
+        backoff: true,
+        max: 60 * 1000
+      },
+      standby: 'when-hidden'
+    });
   }
 
   /**
@@ -234,6 +259,12 @@ export class DaskClusterManager extends Widget {
       return;
     }
     this._poll.dispose();
+    this._timeseriesPoll.dispose();
+    if (this._events) {
+      this._events.onclose = null;
+      this._events.close();
+      this._events = null;
+    }
     super.dispose();
   }
 
@@ -249,6 +280,7 @@ export class DaskClusterManager extends Widget {
     ReactDOM.render(
       <ClusterListing
         clusters={this._clusters}
+        timeseries={this._timeseries}
         activeClusterId={(this._activeCluster && this._activeCluster.id) || ''}
         scaleById={(id: string) => {
           return this._scaleById(id);
@@ -466,11 +498,20 @@ export class DaskClusterManager extends Widget {
    * Refresh the list of clusters on the server.
    */
   private async _updateClusterList(): Promise<void> {
+    // Only fetch the list if it changed since the last time we fetched it.
+    const headers: { [key: string]: string } = {};
+    if (this._listEtag) {
+      headers['If-None-Match'] = this._listEtag;
+    }
     const response = await ServerConnection.makeRequest(
       `${this._serverSettings.baseUrl}dask/clusters`,
-      {},
+      { headers },
       this._serverSettings
     );
+    if (response.status === 304) {
+      this._hasServer = true;
+      return;
+    }
     if (response.status !== 200) {
       this._failedServerChecks++;
       const msg =
@@ -484,17 +525,169 @@ export class DaskClusterManager extends Widget {
     this._hasServer = true;
 
     const data = (await response.json()) as IClusterModel[];
-    this._clusters = data;
+    this._listEtag = response.headers.get('Etag');
+    this._setClusters(data);
+  }
 
-    // Check to see if the active cluster still exits.
-    // If it doesn't, or if there is no active cluster,
-    // select the first one.
-    const active = this._clusters.find(
-      c => c.id === (this._activeCluster && this._activeCluster.id)
+  /**
+   * Fetch the samples of the load of each running cluster taken since
+   * the last fetch, keeping the most recent for their sparklines.
+   * The clusters are fetched concurrently.
+   */
+  private async _updateTimeseries(): Promise<void> {
+    const timeseries: { [id: string]: ITimeseries } = {};
+    for (const cluster of this._clusters) {
+      const old = this._timeseries[cluster.id];
+      if (old) {
+        timeseries[cluster.id] = old;
+      }
+    }
+    const updates = await Promise.all(
+      this._clusters
+        .filter(cluster => cluster.status === 'running')
+        .map(cluster =>
+          this._fetchTimeseries(cluster.id, this._timeseries[cluster.id])
+        )
     );
-    if (!active) {
-      const id = (this._clusters[0] && this._clusters[0].id) || '';
-      this._setActiveById(id);
+    let changed = false;
+    for (const update of updates) {
+      if (update) {
+        timeseries[update.id] = update.timeseries;
+        changed = true;
+      }
+    }
+    if (
+      changed ||
+      Object.keys(timeseries).length !== Object.keys(this._timeseries).length
+    ) {
+      this._timeseries = timeseries;
+      this.update();
+    }
+  }
+
+  /**
+   * Fetch the samples of the load of a cluster taken since the last fetch,
+   * and add them to those already fetched. Returns undefined if there are
+   * no new samples, or they could not be fetched.
+   */
+  private async _fetchTimeseries(
+    id: string,
+    old: ITimeseries | undefined
+  ): Promise<{ id: string; timeseries: ITimeseries } | undefined> {
+    const cursor = old ? old.cursor : 0;
+    const response = await ServerConnection.makeRequest(
+      `${this._serverSettings.baseUrl}dask/clusters/${id}` +
+        `/timeseries?since=${cursor}`,
+      {},
+      this._serverSettings
+    );
+    if (response.status !== 200) {
+      return undefined;
+    }
+    const data = (await response.json()) as ITimeseries;
+    if (!data.columns.time.length) {
+      return undefined;
+    }
+    // The server restarted if the cursor went back.
+    const columns: ITimeseries['columns'] =
+      old && data.cursor > cursor ? { ...old.columns } : {};
+    for (const [name, values] of Object.entries(data.columns)) {
+      columns[name] = [...(columns[name] || []), ...values].slice(
+        -TIMESERIES_LENGTH
+      );
+    }
+    return { id, timeseries: { cursor: data.cursor, columns } };
+  }
+
+  /**
+   * Open a websocket to receive cluster changes pushed by the server,
+   * falling back to polling if it cannot be opened.
+   */
+  private _connectEvents(): void {
+    const settings = this._serverSettings;
+    let url = URLExt.join(settings.wsUrl, 'dask/clusters/events');
+    if (settings.token) {
+      url = url + `?token=${encodeURIComponent(settings.token)}`;
+    }
+    let socket: WebSocket;
+    try {
+      socket = new settings.WebSocket(url);
+    } catch (err) {
+      return;
+    }
+    this._events = socket;
+    socket.onopen = () => {
+      this._eventsSupported = true;
+      void this._poll.stop();
+    };
+    socket.onmessage = (msg: MessageEvent) => {
+      this._onClusterEvent(JSON.parse(msg.data) as IClusterEvent);
+    };
+    socket.onclose = () => {
+      if (this._events !== socket) {
+        return;
+      }
+      this._events = null;
+      if (!this.isDisposed) {
+        void this._poll.start();
+      }
+    };
+  }
+
+  /**
+   * Apply a cluster event pushed by the server.
+   */
+  private _onClusterEvent(event: IClusterEvent): void {
+    this._hasServer = true;
+    switch (event.type) {
+      case 'snapshot':
+        this._setClusters(event.clusters);
+        break;
+      case 'added':
+      case 'updated': {
+        const clusters = [...this._clusters];
+        const index = clusters.findIndex(c => c.id === event.cluster.id);
+        if (index === -1) {
+          clusters.push(event.cluster);
+        } else {
+          clusters[index] = event.cluster;
+        }
+        this._setClusters(clusters);
+        break;
+      }
+      case 'removed':
+        this._setClusters(this._clusters.filter(c => c.id !== event.id));
+        break;
+      default:
+        break;
+    }
+  }
+
+  /**
+   * Set the current list of clusters and rerender.
+   */
+  private _setClusters(clusters: IClusterModel[]): void {
+    this._clusters = clusters;
+
+    // Check to see if the active cluster still exists, and keep its model
+    // up to date. If it doesn't, or if there is no active cluster,
+    // select the first running one.
+    const old = this._activeCluster;
+    const active = this._clusters.find(c => c.id === (old && old.id));
+    if (active) {
+      this._activeCluster = active;
+    } else {
+      const first = this._clusters.find(c => c.status === 'running');
+      if (first) {
+        this._setActiveById(first.id);
+      } else if (old) {
+        this._activeCluster = undefined;
+        this._activeClusterChanged.emit({
+          name: 'cluster',
+          oldValue: old,
+          newValue: undefined
+        });
+      }
     }
     this.update();
   }
@@ -570,6 +763,11 @@ export class DaskClusterManager extends Widget {
   private _injectClientCodeForCluster: (model: IClusterModel) => void;
   private _getClientCodeForCluster: (model: IClusterModel) => string;
   private _poll: Poll;
+  private _timeseriesPoll: Poll;
+  private _timeseries: { [id: string]: ITimeseries } = {};
+  private _events: WebSocket | null = null;
+  private _eventsSupported = false;
+  private _listEtag: string | null = null;
   private _serverSettings: ServerConnection.ISettings;
   private _activeClusterChanged = new Signal<
     this,
@@ -627,6 +825,7 @@ function ClusterListing(props: IClusterListingProps) {
         isActive={cluster.id === props.activeClusterId}
         key={cluster.id}
         cluster={cluster}
+        timeseries={props.timeseries[cluster.id]}
         scale={() => props.scaleById(cluster.id)}
         stop={() => props.stopById(cluster.id)}
         setActive={() => props.setActiveById(cluster.id)}
@@ -652,6 +851,11 @@ export interface IClusterListingProps {
    */
   clusters: IClusterModel[];
 
+  /**
+   * Recent samples of the load of the clusters, by id.
+   */
+  timeseries: { [id: string]: ITimeseries };
+
   /**
    * The id of the active cluster.
    */
@@ -682,10 +886,63 @@ export interface IClusterListingProps {
  * A TSX functional component for rendering a single running cluster.
  */
 function ClusterListingItem(props: IClusterListingItemProps) {
-  const { cluster, isActive, setActive, scale, stop, injectClientCode } = props;
+  const { cluster, timeseries, isActive, setActive, scale, stop } = props;
+  const { injectClientCode } = props;
   let itemClass = 'dask-ClusterListingItem';
   itemClass = isActive ? `${itemClass} jp-mod-active` : itemClass;
 
+  const isRunning = cluster.status === 'running';
+  let status: React.JSX.Element | null = null;
+  if (!isRunning) {
+    status = (
+      <div
+        className={`dask-ClusterListingItem-status dask-mod-${cluster.status}`}
+        title={cluster.error || ''}
+      >
+        Status: {cluster.status}
+        {cluster.error ? `: ${cluster.error}` : ''}
+      </div>
+    );
+  } else if (cluster.stale) {
+    status = (
+      <div
+        className="dask-ClusterListingItem-status dask-mod-stale"
+        title={cluster.error || ''}
+      >
+        Not responding{cluster.error ? `: ${cluster.error}` : ''}
+      </div>
+    );
+  }
+
+  // Changes to the resources in use alone don't update the model,
+  // so show the latest sample of them if there is one.
+  const inUse = Private.latestUsage(cluster, timeseries);
+  let usage: React.JSX.Element | null = null;
+  if (isRunning && inUse.memory_managed !== null) {
+    let memory =
+      `${Private.formatBytes(inUse.memory_managed)} managed, ` +
+      `${Private.formatBytes(inUse.memory_unmanaged || 0)} unmanaged`;
+    if (inUse.memory_spilled) {
+      memory += `, ${Private.formatBytes(inUse.memory_spilled)} spilled`;
+    }
+    let tasks = `${inUse.tasks_processing} processing`;
+    if (inUse.tasks_queued !== null) {
+      tasks += `, ${inUse.tasks_queued} queued`;
+    }
+    usage = (
+      <>
+        <div className="dask-ClusterListingItem-stats">
+          Memory in Use: {memory}
+        </div>
+        <Sparkline timeseries={timeseries} column="memory" />
+        <div className="dask-ClusterListingItem-stats">CPU: {inUse.cpu}%</div>
+        <Sparkline timeseries={timeseries} column="cpu" />
+        <div className="dask-ClusterListingItem-stats">Tasks: {tasks}</div>
+        <Sparkline timeseries={timeseries} column="tasks_processing" />
+      </>
+    );
+  }
+
   let minimum: React.JSX.Element | null = null;
   let maximum: React.JSX.Element | null = null;
   if (cluster.adapt) {
@@ -711,6 +968,7 @@ function ClusterListingItem(props: IClusterListingItemProps) {
       }}
     >
       <div className="dask-ClusterListingItem-title">{cluster.name}</div>
+      {status}
       <div
         className="dask-ClusterListingItem-link"
         title={cluster.scheduler_address}
@@ -737,11 +995,21 @@ function ClusterListingItem(props: IClusterListingItemProps) {
       <div className="dask-ClusterListingItem-stats">
         Number of Workers: {cluster.workers}
       </div>
+      {isRunning ? (
+        <Sparkline timeseries={timeseries} column="workers" />
+      ) : null}
       {minimum}
       {maximum}
+      {usage}
+      {cluster.reap_reason ? (
+        <div className="dask-ClusterListingItem-stats">
+          {cluster.reap_reason}
+        </div>
+      ) : null}
       <div className="dask-ClusterListingItem-button-panel">
         <button
           className="dask-ClusterListingItem-button dask-ClusterListingItem-code dask-CodeIcon jp-mod-styled"
+          disabled={!isRunning}
           onClick={evt => {
             injectClientCode();
             evt.stopPropagation();
@@ -750,6 +1018,7 @@ function ClusterListingItem(props: IClusterListingItemProps) {
         />
         <button
           className="dask-ClusterListingItem-button dask-ClusterListingItem-scale jp-mod-styled"
+          disabled={!isRunning}
           onClick={async evt => {
             evt.stopPropagation();
             return scale();
@@ -773,6 +1042,56 @@ function ClusterListingItem(props: IClusterListingItemProps) {
   );
 }
 
+/**
+ * A TSX functional component for rendering a column of samples
+ * of the load of a cluster as a line, scaled to its maximum.
+ */
+function Sparkline(props: ISparklineProps) {
+  const { timeseries, column } = props;
+  const values = timeseries ? timeseries.columns[column] || [] : [];
+  const points = values.filter(v => v !== null) as number[];
+  if (points.length < 2) {
+    return null;
+  }
+  const width = 100;
+  const height = 20;
+  const max = Math.max(...points) || 1;
+  const step = width / (TIMESERIES_LENGTH - 1);
+  const start = width - (values.length - 1) * step;
+  const line: string[] = [];
+  values.forEach((v, i) => {
+    if (v !== null) {
+      const x = start + i * step;
+      const y = height - 1 - (v / max) * (height - 2);
+      line.push(`${x.toFixed(1)},${y.toFixed(1)}`);
+    }
+  });
+  return (
+    <svg
+      className="dask-ClusterListingItem-sparkline"
+      viewBox={`0 0 ${width} ${height}`}
+      preserveAspectRatio="none"
+    >
+      <polyline points={line.join(' ')} />
+    </svg>
+  );
+}
+
+/**
+ * Props for the sparkline component.
+ */
+export interface ISparklineProps {
+  /**
+   * Recent samples of the load of a cluster, if any.
+   */
+  timeseries: ITimeseries | undefined;
+
+  /**
+   * The column of samples to draw.
+   */
+  column: string;
+}
+
 /**
  * Props for the cluster listing component.
  */
@@ -782,6 +1101,11 @@ export interface IClusterListingItemProps {
    */
   cluster: IClusterModel;
 
+  /**
+   * Recent samples of the load of the cluster, if any.
+   */
+  timeseries: ITimeseries | undefined;
+
   /**
    * Whether the cluster is currently active (i.e., if
    * it is being displayed in the dashboard).
@@ -843,6 +1167,41 @@ export interface IClusterModel extends JSONObject {
    */
   memory: string;
 
+  /**
+   * Total memory limit of the workers of the cluster, in bytes.
+   */
+  memory_limit: number;
+
+  /**
+   * Memory managed by Dask on the workers, in bytes, or `null` if unknown.
+   */
+  memory_managed: number | null;
+
+  /**
+   * Memory used by the worker processes but not managed by Dask, in bytes.
+   */
+  memory_unmanaged: number | null;
+
+  /**
+   * Memory spilled to disk by the workers, in bytes.
+   */
+  memory_spilled: number | null;
+
+  /**
+   * The number of tasks processing on the workers.
+   */
+  tasks_processing: number | null;
+
+  /**
+   * The number of tasks queued on the scheduler, or `null` if unknown.
+   */
+  tasks_queued: number | null;
+
+  /**
+   * The summed CPU use of the workers, in percent.
+   */
+  cpu: number | null;
+
   /**
    * The number of workers for the cluster.
    */
@@ -853,8 +1212,82 @@ export interface IClusterModel extends JSONObject {
    * with the minimum and maximum number of workers. Otherwise it is `null`.
    */
   adapt: null | { minimum: number; maximum: number };
+
+  /**
+   * The lifecycle state of the cluster. Clusters are started in the
+   * background, so a new cluster is "starting" until it is "running".
+   */
+  status: 'starting' | 'running' | 'closing' | 'failed';
+
+  /**
+   * Why the cluster failed to start or is stale, or `null`.
+   */
+  error: string | null;
+
+  /**
+   * Whether this is the last known model of a cluster that
+   * didn't respond in time when the clusters were listed.
+   */
+  stale: boolean;
+
+  /**
+   * How long the cluster has been idle, in seconds, as of the
+   * server's last check for activity.
+   */
+  idle_time: number;
+
+  /**
+   * Why the cluster was last scaled down or closed for being idle, or `null`.
+   */
+  reap_reason: string | null;
+
+  /**
+   * The sizing chosen for the cluster when it was started with
+   * `labextension.sizing.mode` set to "auto", or `null`.
+   */
+  sizing: IClusterSizing | null;
+}
+
+/**
+ * The number of workers, threads per worker and memory limit chosen
+ * for a cluster from the resources of the machine.
+ */
+export interface IClusterSizing extends JSONObject {
+  workers: number;
+  threads_per_worker: number;
+  memory_limit: number;
+  cpus: number;
+  memory: number;
+  numa_nodes: number;
+  pinned: boolean;
+}
+
+/**
+ * Samples of the load of a cluster, as served at
+ * `dask/clusters/{id}/timeseries`: columns of numbers (with `null`
+ * for missing values) named after the fields of the cluster model,
+ * along with a `time` column of unix times.
+ */
+export interface ITimeseries {
+  /**
+   * The number of samples taken so far, to fetch only later ones.
+   */
+  cursor: number;
+
+  /**
+   * The samples, by column.
+   */
+  columns: { [column: string]: (number | null)[] };
 }
 
+/**
+ * An event pushed by the server when the known clusters change.
+ */
+export type IClusterEvent =
+  | { type: 'snapshot'; clusters: IClusterModel[] }
+  | { type: 'added' | 'updated'; cluster: IClusterModel }
+  | { type: 'removed'; id: string };
+
 /**
  * A namespace for module-private functionality.
  */
@@ -867,4 +1300,59 @@ namespace Private {
     image.classList.add('dask-ClusterListingItem-drag');
     return image;
   }
+
+  /**
+   * The fields of a cluster model describing the resources in use.
+   */
+  export type Usage = Pick<
+    IClusterModel,
+    | 'memory_managed'
+    | 'memory_unmanaged'
+    | 'memory_spilled'
+    | 'tasks_processing'
+    | 'tasks_queued'
+    | 'cpu'
+  >;
+
+  /**
+   * The resources in use by a cluster, from the latest sample of its
+   * time series if there is one, or else from its model.
+   */
+  export function latestUsage(
+    cluster: IClusterModel,
+    timeseries: ITimeseries | undefined
+  ): Usage {
+    const usage: Usage = {
+      memory_managed: cluster.memory_managed,
+      memory_unmanaged: cluster.memory_unmanaged,
+      memory_spilled: cluster.memory_spilled,
+      tasks_processing: cluster.tasks_processing,
+      tasks_queued: cluster.tasks_queued,
+      cpu: cluster.cpu
+    };
+    if (!timeseries || !timeseries.columns.time.length) {
+      return usage;
+    }
+    for (const key of Object.keys(usage) as (keyof Usage)[]) {
+      const column = timeseries.columns[key];
+      if (column && column.length) {
+        usage[key] = column[column.length - 1];
+      }
+    }
+    return usage;
+  }
+
+  /**
+   * Format a number of bytes as a human-readable string, like dask does.
+   */
+  export function formatBytes(n: number): string {
+    const units = ['PiB', 'TiB', 'GiB', 'MiB', 'kiB'];
+    for (let i = 0; i < units.length; i++) {
+      const k = 2 ** (10 * (units.length - i));
+      if (n >= k * 0.9) {
+        return `${(n / k).toFixed(2)} ${units[i]}`;
+      }
+    }
+    return `${n} B`;
+  }
 }
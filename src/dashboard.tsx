@@ -650,18 +650,71 @@ namespace Private {
         });
     }
 
-    const response = await ServerConnection.makeRequest(
-      URLExt.join(
-        settings.baseUrl,
-        'dask',
-        'dashboard-check',
-        encodeURIComponent(url)
-      ),
-      {},
-      settings
-    );
-    const info = (await response.json()) as DashboardURLInfo;
-    return info;
+    return checkOnServer(url, settings);
+  }
+
+  /**
+   * Dashboard checks waiting to be sent to the server.
+   */
+  let pendingChecks: {
+    url: string;
+    settings: ServerConnection.ISettings;
+    resolve: (info: DashboardURLInfo) => void;
+    reject: (reason: any) => void;
+  }[] = [];
+
+  /**
+   * Check a URL with the server extension. Checks requested in the same
+   * tick are sent together to the batch endpoint.
+   */
+  function checkOnServer(
+    url: string,
+    settings: ServerConnection.ISettings
+  ): Promise<DashboardURLInfo> {
+    return new Promise<DashboardURLInfo>((resolve, reject) => {
+      pendingChecks.push({ url, settings, resolve, reject });
+      if (pendingChecks.length === 1) {
+        setTimeout(() => void flushChecks(), 0);
+      }
+    });
+  }
+
+  /**
+   * Send the pending dashboard checks to the server.
+   */
+  async function flushChecks(): Promise<void> {
+    const checks = pendingChecks;
+    pendingChecks = [];
+    const settings = checks[0].settings;
+    try {
+      let infos: DashboardURLInfo[];
+      if (checks.length === 1) {
+        const response = await ServerConnection.makeRequest(
+          URLExt.join(
+            settings.baseUrl,
+            'dask',
+            'dashboard-check',
+            encodeURIComponent(checks[0].url)
+          ),
+          {},
+          settings
+        );
+        infos = [(await response.json()) as DashboardURLInfo];
+      } else {
+        const response = await ServerConnection.makeRequest(
+          URLExt.join(settings.baseUrl, 'dask', 'dashboard-check'),
+          {
+            method: 'POST',
+            body: JSON.stringify({ urls: checks.map(check => check.url) })
+          },
+          settings
+        );
+        infos = (await response.json()) as DashboardURLInfo[];
+      }
+      checks.forEach((check, i) => check.resolve(infos[i]));
+    } catch (err) {
+      checks.forEach(check => check.reject(err));
+    }
   }
 
   export function createInactivePanel(): HTMLElement {
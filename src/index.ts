@@ -259,7 +259,11 @@ async function activate(
       return;
     }
     const cluster = sidebar.clusterManager.activeCluster;
-    if (!cluster || !(await Private.shouldUseKernel(session.kernel))) {
+    if (
+      !cluster ||
+      cluster.status !== 'running' ||
+      !(await Private.shouldUseKernel(session.kernel))
+    ) {
       return;
     }
     return Private.createClientForKernel(cluster, session.kernel!);